@@ -0,0 +1,80 @@
+import re
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+
+class RateLimitError(Exception):
+    # Erro equivalente ao 429 da API
+    status_code = 429
+
+
+class FakeOpenAI:
+    def __init__(self, latency=0.05, embedding_dim=1536, explanation="Explicação gerada localmente para o benchmark.", rate_limit_every=0):
+        # Substituto local do cliente da OpenAI: latência configurável, embeddings determinísticos e,
+        # opcionalmente, um 429 a cada rate_limit_every chamadas
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.embedding_dim = embedding_dim
+        self.explanation = explanation
+        self.lock = threading.Lock()
+        self.calls = {'embeddings': 0, 'chat': 0}
+        self.embeddings = SimpleNamespace(create=self.create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+
+    def count(self, kind):
+        with self.lock:
+            self.calls[kind] += 1
+            total = self.calls['embeddings'] + self.calls['chat']
+        if self.rate_limit_every and total % self.rate_limit_every == 0:
+            raise RateLimitError("Rate limit reached")
+
+    def embed(self, text):
+        # Saco de palavras com hashing: frases parecidas produzem vetores próximos
+        vector = np.zeros(self.embedding_dim, dtype=np.float32)
+        for word in re.findall(r'\w+', text.lower()):
+            vector[int(hashlib.md5(word.encode('utf-8')).hexdigest()[:8], 16) % self.embedding_dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def usage(self, prompt_tokens, completion_tokens):
+        return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens)
+
+    def create_embeddings(self, input, model):
+        self.count('embeddings')
+        time.sleep(self.latency)
+        texts = [input] if isinstance(input, str) else input
+        data = [SimpleNamespace(embedding=self.embed(text), index=i) for i, text in enumerate(texts)]
+        return SimpleNamespace(data=data, model=model, usage=self.usage(sum(len(text.split()) for text in texts), 0))
+
+    def pick_function(self, question, functions):
+        # Escolhe a função cuja descrição compartilha mais palavras com a pergunta
+        words = set(re.findall(r'\w+', question.lower()))
+        return max(functions, key=lambda function: len(words & set(re.findall(r'\w+', function['description'].lower()))))['name']
+
+    def create_completion(self, model, messages, functions=None, stream=False, **kwargs):
+        self.count('chat')
+        prompt_tokens = sum(len(message['content'].split()) for message in messages)
+        if stream:
+            return self.stream_completion(prompt_tokens)
+        time.sleep(self.latency)
+        if functions:
+            name = self.pick_function(messages[-1]['content'], functions)
+            message = SimpleNamespace(content=None, function_call=SimpleNamespace(name=name, arguments='{}'))
+        else:
+            message = SimpleNamespace(content=self.explanation, function_call=None)
+        choice = SimpleNamespace(index=0, message=message, finish_reason='stop')
+        return SimpleNamespace(choices=[choice], model=model, usage=self.usage(prompt_tokens, len(self.explanation.split())))
+
+    def stream_completion(self, prompt_tokens):
+        # Divide a latência entre o primeiro token e os pedaços seguintes
+        time.sleep(self.latency / 2)
+        words = self.explanation.split(' ')
+        for i, word in enumerate(words):
+            time.sleep(self.latency / 2 / len(words))
+            token = word if i == 0 else f" {word}"
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=token), finish_reason=None)], usage=None)
+        yield SimpleNamespace(choices=[], usage=self.usage(prompt_tokens, len(words)))
@@ -0,0 +1,184 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import Main  # noqa: E402
+from fake_openai import FakeOpenAI  # noqa: E402
+from switch_planner import plan_fleet  # noqa: E402
+from sharded_preprocess import aggregate_minute_means_sharded  # noqa: E402
+
+BUNDLED_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def generate_dataset(scale, out_dir):
+    # Replica os CSVs de treino com clientes renomeados e métricas levemente alteradas, de forma determinística
+    os.makedirs(out_dir, exist_ok=True)
+    for name, value_column in [('bitrate_train', 'bitrate'), ('rtt_train', 'rtt')]:
+        source = pd.read_csv(os.path.join(BUNDLED_DATA_DIR, f'{name}.csv'))
+        path = os.path.join(out_dir, f'{name}.csv')
+        for copy in range(scale):
+            chunk = source.copy()
+            if copy:
+                chunk['client'] = chunk['client'] + f'{copy:04d}'
+                chunk[value_column] = chunk[value_column] * (1 + 0.01 * (copy % 7))
+            chunk.to_csv(path, mode='a' if copy else 'w', header=not copy, index=False)
+    return out_dir
+
+
+def percentiles(samples):
+    # Percentis de latência em milissegundos
+    values = np.asarray(samples) * 1000
+    return {'p50': float(np.percentile(values, 50)), 'p95': float(np.percentile(values, 95)), 'p99': float(np.percentile(values, 99)), 'n': len(values)}
+
+
+def timed(function, iterations, before=None):
+    # Executa a função várias vezes e devolve as durações
+    samples = []
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def sample_questions(app):
+    # Uma pergunta por intenção, com a entidade exigida pela função
+    client_name = sorted(app.known_clients)[0]
+    server_name = sorted(app.known_servers)[0]
+    questions = []
+    for intent, phrases in app.intent_table.items():
+        entity = app.function_entities[intent]
+        suffix = {'client': f" {client_name}", 'server': f" {server_name}"}.get(entity, "")
+        questions.extend(f"{phrase}{suffix}" for phrase in phrases)
+    return questions
+
+
+def run_scale(scale, latency, iterations, concurrency_levels):
+    # Mede uma escala de dados em um processo próprio, para que o pico de memória seja isolado
+    work_dir = tempfile.mkdtemp(prefix=f'qoe-bench-{scale}x-')
+    try:
+        data_dir = BUNDLED_DATA_DIR if scale == 1 else generate_dataset(scale, os.path.join(work_dir, 'data'))
+        cache_dir = os.path.join(work_dir, 'cache')
+        client = FakeOpenAI(latency=latency)
+        report = {'scale': scale, 'latency_ms': latency * 1000}
+
+        # Inicialização a frio (sem caches) e a quente (armazenamento colunar e embeddings já gerados)
+        start = time.perf_counter()
+        app = Main('bench', data_dir=data_dir, cache_dir=cache_dir, client=client)
+        report['startup_cold_s'] = time.perf_counter() - start
+        start = time.perf_counter()
+        app = Main('bench', data_dir=data_dir, cache_dir=cache_dir, client=client)
+        report['startup_warm_s'] = time.perf_counter() - start
+        report['rows'] = {'bitrate': len(app.bitrate_data), 'rtt': len(app.latency_data), 'preprocessed': len(app.preprocessed_data)}
+
+        questions = sample_questions(app)
+        question_embedding = app.generate_embeddings([questions[0]])[0]
+
+        def clear_cache():
+            # Cada medição paga o pipeline completo: sem explicações nem respostas reaproveitadas
+            app.explanation_cache.clear()
+            app.answer_cache.clear()
+
+        client_name = sorted(app.known_clients)[0]
+        server_name = sorted(app.known_servers)[0]
+
+        # Latência por etapa
+        stages = {
+            'preprocess_data': lambda: app.preprocess_data(),
+            'aggregate_minute_means_sharded': lambda: aggregate_minute_means_sharded(app.bitrate_data, app.latency_data, app.preprocess_workers),
+            'build_stats_index': lambda: app.build_stats_index(),
+            'build_rollups': lambda: app.build_rollups(),
+            'generate_embeddings_cached': lambda: app.generate_embeddings([questions[0]]),
+            'find_most_similar': lambda: app.find_most_similar(question_embedding),
+            'route_question': lambda: app.route_question(question_embedding),
+            'plan_fleet': lambda: plan_fleet(app.preprocessed_data, app.switch_penalty),
+        }
+        for intent, entity in app.function_entities.items():
+            arguments = {'client': (client_name,), 'server': (server_name,)}.get(entity, ())
+            stages[intent] = (lambda function, arguments: lambda: function(*arguments))(getattr(app, intent), arguments)
+        report['stages'] = {}
+        for name, function in stages.items():
+            count = max(1, iterations // 10) if name in ('preprocess_data', 'aggregate_minute_means_sharded', 'build_stats_index', 'build_rollups', 'plan_fleet') else iterations
+            report['stages'][name] = percentiles(timed(function, count, before=clear_cache))
+
+        question_samples = []
+        for question in questions:
+            question_samples.extend(timed(lambda: app.answer_question(question), max(1, iterations // 10), before=clear_cache))
+        report['stages']['answer_question'] = percentiles(question_samples)
+
+        # Vazão com perguntas simultâneas; os caches são limpos antes de cada pergunta para que as rodadas
+        # repetidas meçam o pipeline com as chamadas ao GPT, e não acertos de cache
+        def answer_uncached(question):
+            clear_cache()
+            return app.answer_question(question)
+
+        report['throughput'] = {}
+        for concurrency in concurrency_levels:
+            batch = questions * max(1, (concurrency * 4) // len(questions) + 1)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(answer_uncached, batch))
+            elapsed = time.perf_counter() - start
+            report['throughput'][str(concurrency)] = {'questions': len(batch), 'seconds': elapsed, 'questions_per_s': len(batch) / elapsed}
+
+        report['openai_calls'] = dict(client.calls)
+        report['peak_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return report
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_report(report):
+    print(f"\n=== Escala {report['scale']}x ({report['rows']['bitrate']} linhas de bitrate, {report['rows']['rtt']} de RTT) ===")
+    print(f"Inicialização: fria {report['startup_cold_s']:.2f}s, quente {report['startup_warm_s']:.2f}s | pico de memória {report['peak_rss_mb']:.0f} MB")
+    print(f"{'etapa':<46}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report['stages'].items():
+        print(f"{name:<46}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}")
+    for concurrency, stats in report['throughput'].items():
+        print(f"concorrência {concurrency:>3}: {stats['questions_per_s']:.1f} perguntas/s ({stats['questions']} em {stats['seconds']:.2f}s)")
+    print(f"chamadas à API simulada: {report['openai_calls']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de QoE com um cliente OpenAI local")
+    parser.add_argument('--scales', default='1,10', help="fatores de escala dos dados, separados por vírgula (ex.: 1,10,100,1000)")
+    parser.add_argument('--latency', type=float, default=0.05, help="latência simulada de cada chamada à API, em segundos")
+    parser.add_argument('--iterations', type=int, default=50, help="repetições por etapa")
+    parser.add_argument('--concurrency', default='1,8,32', help="níveis de concorrência para a medição de vazão")
+    parser.add_argument('--json', metavar='ARQUIVO', help="grava os resultados em JSON")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    concurrency_levels = [int(level) for level in args.concurrency.split(',')]
+
+    if args.worker:
+        print(json.dumps(run_scale(args.worker, args.latency, args.iterations, concurrency_levels)))
+        sys.exit(0)
+
+    reports = []
+    for scale in [int(scale) for scale in args.scales.split(',')]:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', str(scale), '--latency', str(args.latency),
+             '--iterations', str(args.iterations), '--concurrency', args.concurrency],
+            check=True, capture_output=True, text=True
+        ).stdout
+        report = json.loads(output.strip().splitlines()[-1])
+        print_report(report)
+        reports.append(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,117 @@
+import os
+import json
+import time
+import shutil
+
+import numpy as np
+import pandas as pd
+
+STORE_VERSION = 3
+ENTITY_COLUMNS = ['client', 'server']
+
+
+def source_signature(csv_path):
+    # Identifica a versão do CSV de origem pelo tamanho e data de modificação
+    stat = os.stat(csv_path)
+    return {'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_meta(store_dir):
+    # Lê os metadados do armazenamento, se existirem
+    meta_path = os.path.join(store_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def is_fresh(csv_path, store_dir):
+    # Verifica se o armazenamento colunar corresponde ao CSV atual
+    meta = read_meta(store_dir)
+    return meta is not None and meta.get('version') == STORE_VERSION and meta.get('source') == source_signature(csv_path)
+
+
+def ingest_csv(csv_path, store_dir, value_column):
+    # Converte o CSV uma única vez em colunas binárias: códigos de dicionário para cliente/servidor
+    # (no tipo inteiro que o pandas usa para o número de categorias), timestamps inteiros e a métrica em float32.
+    # Cada ingestão grava as colunas em um novo diretório de versão: processos que ainda mapeiam a versão
+    # anterior continuam lendo arquivos intactos, com os dicionários correspondentes
+    data = pd.read_csv(
+        csv_path,
+        usecols=ENTITY_COLUMNS + ['timestamp', value_column],
+        dtype={'client': 'category', 'server': 'category', 'timestamp': 'int64', value_column: 'float32'}
+    )
+    columns_dir = f'columns.{time.time_ns()}.{os.getpid()}'
+    os.makedirs(os.path.join(store_dir, columns_dir))
+
+    dictionaries = {}
+    for column in ENTITY_COLUMNS:
+        categorical = data[column].cat
+        dictionaries[column] = [str(category) for category in categorical.categories]
+        np.save(os.path.join(store_dir, columns_dir, f'{column}.npy'), categorical.codes.to_numpy())
+    np.save(os.path.join(store_dir, columns_dir, 'timestamp.npy'), data['timestamp'].to_numpy(dtype=np.int64))
+    np.save(os.path.join(store_dir, columns_dir, f'{value_column}.npy'), data[value_column].to_numpy(dtype=np.float32))
+
+    # Os metadados são gravados por último, de forma atômica, apontando para a nova versão
+    meta = {
+        'version': STORE_VERSION,
+        'source': source_signature(csv_path),
+        'value_column': value_column,
+        'rows': len(data),
+        'dictionaries': dictionaries,
+        'columns_dir': columns_dir,
+    }
+    tmp_path = os.path.join(store_dir, f'meta.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(store_dir, 'meta.json'))
+    remove_old_versions(store_dir, columns_dir)
+
+
+def remove_old_versions(store_dir, current):
+    # Remove as versões anteriores; arquivos já mapeados por outros processos continuam válidos
+    # até serem desmapeados, pois remover só desfaz a entrada no diretório
+    for entry in os.scandir(store_dir):
+        if entry.name == current or entry.name.endswith('.tmp') or entry.name == 'meta.json':
+            continue
+        if entry.is_dir() and entry.name.startswith('columns.'):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        elif entry.name.endswith('.npy'):
+            os.remove(entry.path)
+
+
+def open_store(store_dir):
+    # Abre as colunas mapeadas em memória (somente leitura), sem reprocessar o CSV; os códigos já estão
+    # no tipo inteiro esperado pelo pandas e foram validados na ingestão, então as categóricas também não copiam.
+    # Todas as colunas vêm da versão indicada por uma única leitura dos metadados
+    meta = read_meta(store_dir)
+    columns_dir = os.path.join(store_dir, meta['columns_dir'])
+    columns = {}
+    for column in ENTITY_COLUMNS:
+        codes = np.load(os.path.join(columns_dir, f'{column}.npy'), mmap_mode='r')
+        columns[column] = pd.Categorical.from_codes(codes, categories=meta['dictionaries'][column], validate=False)
+    columns['timestamp'] = np.load(os.path.join(columns_dir, 'timestamp.npy'), mmap_mode='r')
+    value_column = meta['value_column']
+    columns[value_column] = np.load(os.path.join(columns_dir, f'{value_column}.npy'), mmap_mode='r')
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_measurements(csv_path, store_dir, value_column):
+    # Gera o armazenamento colunar quando ausente ou desatualizado e o abre em seguida
+    if not is_fresh(csv_path, store_dir):
+        ingest_csv(csv_path, store_dir, value_column)
+    try:
+        return open_store(store_dir)
+    except FileNotFoundError:
+        # Uma ingestão concorrente removeu a versão indicada pelos metadados lidos: gerar uma nova
+        ingest_csv(csv_path, store_dir, value_column)
+        return open_store(store_dir)
+
+
+if __name__ == '__main__':
+    # Ingestão manual: python columnar_store.py
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    store_root = os.path.join(os.path.dirname(__file__), '.cache', 'columnar')
+    for name, value_column in [('bitrate_train', 'bitrate'), ('rtt_train', 'rtt')]:
+        ingest_csv(os.path.join(data_dir, f'{name}.csv'), os.path.join(store_root, name), value_column)
+        print(f"{name}: armazenamento colunar gerado em {os.path.join(store_root, name)}")
@@ -0,0 +1,69 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class EmbeddingCache:
+    def __init__(self, cache_dir, max_bytes=64 * 1024 * 1024):
+        # Armazena os embeddings em disco, endereçados pelo conteúdo (modelo, texto),
+        # com uma camada LRU em memória limitada pelo tamanho em bytes
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, model, text):
+        # Chave determinística a partir do nome do modelo e do texto
+        return hashlib.sha256(f"{model}\0{text}".encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        # Caminho do arquivo .npy correspondente à chave
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npy")
+
+    def _remember(self, key, vector):
+        # Insere o vetor na LRU em memória e descarta os menos usados se exceder o limite
+        if key in self.memory:
+            self.memory_bytes -= self.memory.pop(key).nbytes
+        self.memory[key] = vector
+        self.memory_bytes += vector.nbytes
+        while self.memory_bytes > self.max_bytes and len(self.memory) > 1:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+
+    def get(self, model, text):
+        # Busca primeiro na memória e depois em disco; retorna None em caso de falta
+        key = self.make_key(model, text)
+        with self.lock:
+            vector = self.memory.get(key)
+            if vector is not None:
+                self.memory.move_to_end(key)
+                return vector
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            vector = np.load(path)
+        except (OSError, ValueError):
+            return None
+        with self.lock:
+            self._remember(key, vector)
+        return vector
+
+    def put(self, model, text, embedding):
+        # Grava o vetor (float32) em disco de forma atômica e na memória
+        key = self.make_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, vector)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self._remember(key, vector)
+        return vector
@@ -0,0 +1,14 @@
+import os
+
+from wsgi import post_fork  # noqa: F401
+
+# Carregar a aplicação no processo mestre antes do fork, para que os workers compartilhem o estado
+wsgi_app = 'wsgi:create_app()'
+preload_app = True
+bind = os.environ.get('QOE_BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('QOE_WORKERS', os.cpu_count() or 1))
+
+# Threads por worker: as perguntas ficam no executor interno e as consultas periódicas são rápidas
+worker_class = 'gthread'
+threads = int(os.environ.get('QOE_THREADS', 8))
+timeout = 120
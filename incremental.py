@@ -0,0 +1,168 @@
+import io
+import os
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from stats_index import as_datetime, plain_keys
+
+logger = logging.getLogger(__name__)
+
+BUCKET_KEYS = ['client', 'server', 'minute']
+METRICS = {'bitrate': 'Normalized_Bitrate', 'rtt': 'Normalized_Latency'}
+
+
+def aggregate_minutes(data, column):
+    # Soma e contagem da métrica por (cliente, servidor, minuto) para um lote de medições
+    minutes = as_datetime(data['timestamp']).dt.floor('min').rename('minute')
+    grouped = data[column].astype(float).groupby(
+        [plain_keys(data['client']), plain_keys(data['server']), minutes]
+    ).agg(['sum', 'count'])
+    grouped.columns = [f'{column}_sum', f'{column}_count']
+    return grouped
+
+
+class QoEAggregator:
+    def __init__(self):
+        # Somas e contagens por bucket (cliente, servidor, minuto) e o quadro de QoE derivado delas
+        self.buckets = None
+        self.frame = None
+
+        # Limites correntes (mínimo, máximo) usados na normalização min-max de cada métrica
+        self.bounds = {column: (np.inf, -np.inf) for column in METRICS}
+        self.version = 0
+
+        # Última inclusão: se toda a QoE foi renormalizada e as linhas alteradas antes e depois dela
+        self.renormalized = False
+        self.changed = None
+
+    def append(self, bitrate_data=None, latency_data=None):
+        # Atualiza apenas os buckets afetados pelas novas medições e devolve seus índices
+        batches = []
+        if bitrate_data is not None and not bitrate_data.empty:
+            batches.append(aggregate_minutes(bitrate_data, 'bitrate'))
+        if latency_data is not None and not latency_data.empty:
+            batches.append(aggregate_minutes(latency_data, 'rtt'))
+        if not batches:
+            return None
+
+        columns = [f'{column}_{stat}' for column in METRICS for stat in ('sum', 'count')]
+        batch = pd.concat(batches, axis=1).reindex(columns=columns).fillna(0.0)
+        affected = batch.index
+
+        # Somar o lote aos buckets existentes e acrescentar os novos
+        if self.buckets is None:
+            self.buckets = batch
+        else:
+            existing = affected.intersection(self.buckets.index)
+            if len(existing):
+                self.buckets.loc[existing] = self.buckets.loc[existing] + batch.loc[existing]
+            new = affected.difference(self.buckets.index)
+            if len(new):
+                self.buckets = pd.concat([self.buckets, batch.loc[new]])
+
+        # Médias por minuto dos buckets afetados que já têm bitrate e RTT (equivalente ao merge interno)
+        rows = self.buckets.loc[affected]
+        rows = rows[(rows['bitrate_count'] > 0) & (rows['rtt_count'] > 0)]
+        values = pd.DataFrame({
+            'bitrate': rows['bitrate_sum'] / rows['bitrate_count'],
+            'rtt': rows['rtt_sum'] / rows['rtt_count'],
+        })
+
+        if self.frame is None:
+            previous = values.iloc[0:0]
+            before = None
+            self.frame = values.copy()
+        else:
+            before = self.frame.reindex(values.index)
+            previous = before[list(METRICS)].dropna()
+            new = values.index.difference(self.frame.index)
+            if len(new):
+                self.frame = pd.concat([self.frame, values.loc[new]])
+            self.frame.loc[values.index, list(METRICS)] = values
+
+        # Recalcular a QoE de todas as linhas apenas se os limites de normalização mudaram
+        self.renormalized = self.update_bounds(values, previous) or before is None
+        if self.renormalized:
+            self.normalize(self.frame.index)
+        else:
+            self.normalize(values.index)
+        self.changed = (before, self.frame.loc[values.index])
+
+        self.version += 1
+        return affected
+
+    def update_bounds(self, values, previous):
+        # Mantém mínimo/máximo correntes; refaz a varredura só se um bucket que definia o limite se afastou dele
+        moved = False
+        for column in METRICS:
+            low, high = self.bounds[column]
+            new_low = min(low, values[column].min()) if len(values) else low
+            new_high = max(high, values[column].max()) if len(values) else high
+            changed = values[column].reindex(previous.index)
+            if ((previous[column] == low) & (changed > low)).any() or ((previous[column] == high) & (changed < high)).any():
+                new_low = self.frame[column].min()
+                new_high = self.frame[column].max()
+            if (new_low, new_high) != (low, high):
+                self.bounds[column] = (new_low, new_high)
+                moved = True
+        return moved
+
+    def normalize(self, index):
+        # Normalização min-max com os limites correntes e QoE = bitrate normalizado / latência normalizada
+        rows = self.frame.loc[index]
+        for column, normalized_column in METRICS.items():
+            low, high = self.bounds[column]
+            self.frame.loc[index, normalized_column] = (rows[column] - low) / (high - low)
+        self.frame.loc[index, 'QoE'] = self.frame.loc[index, 'Normalized_Bitrate'] / self.frame.loc[index, 'Normalized_Latency']
+
+    def to_frame(self):
+        # Quadro no mesmo formato de Main.preprocess_data
+        if self.frame is None:
+            return pd.DataFrame(columns=BUCKET_KEYS + ['bitrate', 'rtt', 'Normalized_Bitrate', 'Normalized_Latency', 'QoE'])
+        frame = self.frame.sort_index().reset_index()
+        frame.columns = BUCKET_KEYS + list(frame.columns[len(BUCKET_KEYS):])
+        return frame
+
+
+class CsvTailer(threading.Thread):
+    def __init__(self, path, on_rows, poll_interval=1.0, from_start=False):
+        # Acompanha um CSV em crescimento e entrega as novas linhas completas como DataFrame
+        super().__init__(daemon=True)
+        self.path = path
+        self.on_rows = on_rows
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+
+        with open(self.path, 'rb') as f:
+            self.header = f.readline().decode('utf-8').strip().split(',')
+            self.offset = f.tell() if from_start else os.path.getsize(self.path)
+
+    def poll(self):
+        # Lê a partir do último deslocamento, ignorando uma linha final ainda incompleta; o deslocamento
+        # só avança depois que as linhas foram incorporadas, para que uma falha as repita na próxima leitura
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return None
+        rows = pd.read_csv(io.BytesIO(chunk[:end + 1]), names=self.header, header=None)
+        if not rows.empty:
+            self.on_rows(rows)
+        self.offset += end + 1
+        return rows
+
+    def run(self):
+        # Uma falha na leitura ou na incorporação é registrada e a leitura é tentada de novo no próximo ciclo
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Falha ao incorporar novas linhas de %s", self.path)
+            self.stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self.stop_event.set()
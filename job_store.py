@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import threading
+
+
+class SharedJobStore:
+    def __init__(self, jobs_dir, flush_interval=0.2, max_age=3600):
+        # Espelho em disco das perguntas em andamento, para que qualquer processo worker
+        # responda à consulta periódica de um trabalho iniciado em outro worker
+        self.jobs_dir = jobs_dir
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.last_flush = {}
+        self.pending = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def _path(self, job_id):
+        # Caminho do arquivo .json do trabalho
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write(self, job_id, entry):
+        # Grava o estado do trabalho de forma atômica
+        path = self._path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def publish_progress(self, job_id, text, force=False):
+        # Publica a resposta parcial, no máximo uma vez a cada flush_interval segundos; um texto que chega
+        # antes disso fica pendente e é gravado quando o intervalo termina, para que a última atualização
+        # de uma rajada (ou a informação principal logo após o início) não se perca.
+        # As gravações ocorrem sob o lock, para que uma pendente nunca sobrescreva uma posterior
+        with self.lock:
+            wait = self.flush_interval - (time.monotonic() - self.last_flush.get(job_id, float('-inf')))
+            if not force and wait > 0:
+                self.pending[job_id] = text
+                if job_id not in self.timers:
+                    timer = self.timers[job_id] = threading.Timer(wait, self._flush_pending, args=(job_id,))
+                    timer.daemon = True
+                    timer.start()
+                return
+            self.pending.pop(job_id, None)
+            self.last_flush[job_id] = time.monotonic()
+            self._write(job_id, {'done': False, 'text': text})
+
+    def _flush_pending(self, job_id):
+        # Grava o texto pendente ao fim do intervalo, se o trabalho ainda não publicou outro estado
+        with self.lock:
+            self.timers.pop(job_id, None)
+            text = self.pending.pop(job_id, None)
+            if text is None:
+                return
+            self.last_flush[job_id] = time.monotonic()
+            self._write(job_id, {'done': False, 'text': text})
+
+    def publish_result(self, job_id, result):
+        # Publica a resposta final (resposta, status), descartando o andamento ainda pendente
+        with self.lock:
+            self.last_flush.pop(job_id, None)
+            self.pending.pop(job_id, None)
+            timer = self.timers.pop(job_id, None)
+            if timer is not None:
+                timer.cancel()
+            self._write(job_id, {'done': True, 'result': list(result)})
+
+    def read(self, job_id):
+        # Estado publicado do trabalho, ou None se desconhecido
+        try:
+            with open(self._path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def evict(self, result_ttl):
+        # Remove os trabalhos concluídos há mais de result_ttl segundos e os abandonados há mais de max_age;
+        # o resultado é a última gravação do trabalho, então a data de modificação marca a conclusão
+        now = time.time()
+        for entry in os.scandir(self.jobs_dir):
+            try:
+                age = now - entry.stat().st_mtime
+            except OSError:
+                continue
+            if age <= result_ttl:
+                continue
+            if age <= self.max_age and entry.name.endswith('.json'):
+                state = self.read(entry.name[:-len('.json')])
+                if state is None or not state['done']:
+                    continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
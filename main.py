@@ -1,79 +1,224 @@
 import os
+import re
+import argparse
+import json
+import hashlib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
-from openai import OpenAI
+from flask import Response
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from embedding_cache import EmbeddingCache
+from stats_index import StatsIndex
+from columnar_store import load_measurements, source_signature
+from incremental import QoEAggregator, CsvTailer
+from streaming import AnswerProgress
+from response_cache import ResponseCache
+from metrics import Metrics
+from switch_planner import plan_fleet
+from rollups import RollupPyramid
+from job_store import SharedJobStore
+from sharded_preprocess import aggregate_minute_means, aggregate_minute_means_sharded
+from snapshot import load_snapshot, save_snapshot
+from semantic_cache import SemanticAnswerCache
+from openai_gateway import OpenAIGateway
+
+def normalize_rows(vectors):
+    # Matriz float32 com cada linha de norma 1, para similaridade de cosseno por produto escalar
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
 
 class Main:
-    def __init__(self, api_key):
-        # Configurar a chave da API da OpenAI
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key, max_workers=16, data_dir=None, cache_dir=None, client=None, trace_log=None, preprocess_workers=None, shared_jobs=False):
+        # Configurar a chave da API da OpenAI com um cliente HTTP compartilhado e pool de conexões limitado
+        self.api_key = api_key
+        self.injected_client = client
+        self.max_workers = max_workers
+        self.http_client = None
+        self.openai_requests_per_second = 50.0
+        self.ready = False
+
+        # Métricas de latência por etapa, uso da OpenAI e caches (expostas em /metrics)
+        self.metrics = Metrics(trace_log=trace_log)
+
+        # Camada sobre o cliente: junta pedidos idênticos, agrupa embeddings, limita a taxa e repete 429.
+        # Criada só no primeiro uso de self.client, então um início restaurado do snapshot não importa o SDK
+        self._client = None
+        self.client_lock = threading.Lock()
+
+        # Executores: um para as perguntas em andamento e outro para chamadas de E/S sobrepostas a elas
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='question')
+        self.io_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='io')
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.local = threading.local()
+
+        # Trabalhos não consultados (aba fechada, pergunta substituída) são descartados: os concluídos após
+        # job_result_ttl segundos e qualquer um após job_max_age segundos
+        self.job_result_ttl = 60
+        self.job_max_age = 900
+
+        # Cache persistente de embeddings (modelo, texto) -> vetor float32
+        self.cache_dir = cache_dir or os.path.join(os.path.dirname(__file__), '.cache')
+        self.embedding_model = "text-embedding-ada-002"
+        self.embedding_cache = EmbeddingCache(os.path.join(self.cache_dir, 'embeddings'))
+
+        # Carregar os dados das métricas (armazenamento colunar mapeado em memória, gerado a partir dos CSVs)
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
+        self.store_dir = os.path.join(self.cache_dir, 'columnar')
+        self.bitrate_data = load_measurements(os.path.join(self.data_dir, 'bitrate_train.csv'), os.path.join(self.store_dir, 'bitrate_train'), 'bitrate')
+        self.latency_data = load_measurements(os.path.join(self.data_dir, 'rtt_train.csv'), os.path.join(self.store_dir, 'rtt_train'), 'rtt')
+
+        # Versão dos dados: identifica os CSVs de origem e é alterada a cada inclusão de novas medições
+        self.base_data_version = hashlib.sha256(json.dumps([
+            source_signature(os.path.join(self.data_dir, name)) for name in ('bitrate_train.csv', 'rtt_train.csv')
+        ]).encode('utf-8')).hexdigest()[:16]
+        self.data_version = self.base_data_version
+        self.appended_batches = 0
+
+        # Cache das explicações do GPT, indexado pelo prompt e pela versão dos dados
+        self.explanation_cache = ResponseCache(max_entries=1024, ttl=3600, cache_dir=os.path.join(self.cache_dir, 'explanations'))
+
+        # Cache semântico das respostas finais: paráfrases de uma pergunta já respondida, com as mesmas
+        # entidades e a mesma versão dos dados, não chamam o GPT (raio de similaridade ajustável)
+        self.answer_cache = SemanticAnswerCache(max_entries=2048, radius=0.95)
+
+        # Com vários processos worker, o andamento das perguntas é espelhado em disco para que a
+        # consulta periódica possa ser atendida por qualquer worker
+        self.shared_jobs = SharedJobStore(os.path.join(self.cache_dir, 'jobs')) if shared_jobs else None
 
-        # Carregar os dados das métricas
-        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
-        self.bitrate_data = pd.read_csv(os.path.join(self.data_dir, 'bitrate_train.csv'))
-        self.latency_data = pd.read_csv(os.path.join(self.data_dir, 'rtt_train.csv'))
+        # Pré-análise dos dados em paralelo a partir de parallel_min_rows medições
+        self.preprocess_workers = preprocess_workers or os.cpu_count() or 1
+        self.parallel_min_rows = 2_000_000
 
-        # Realizar a pré-análise dos dados
-        self.preprocessed_data = self.preprocess_data()
+        # Snapshot do estado inicializado (pré-análise, índices e embeddings de referência) para reinícios rápidos
+        self.snapshot_dir = os.path.join(self.cache_dir, 'snapshot')
 
-        # Frases de referência para identificação de perguntas
-        self.reference_phrases = [
+        # Agregador incremental da QoE, criado na primeira inclusão de novas medições
+        self.qoe_aggregator = None
+        self.data_lock = threading.Lock()
+        self._preprocessed_data = None
+        self.preprocessed_stale = False
+        self.tailers = []
+
+        # Tabela de intenções: cada grupo de frases de referência aponta para a função que o responde
+        self.intent_table = {
             # Perguntas relacionadas à pior qualidade de recepção de vídeo
-            "pior qualidade de recepção de vídeo",
-            "pior vídeo",
-            "baixa qualidade na recepção do vídeo",
-            "baixa qualidade na recepção da informação",
-            "qualidade ruim no vídeo",
-            "vídeo ruim",
-            "cliente com vídeo ruim",
-            "qual cliente tem a pior qualidade de recepção de vídeo ao longo do tempo",
+            'calculate_qoe_with_explanation': [
+                "pior qualidade de recepção de vídeo",
+                "pior vídeo",
+                "baixa qualidade na recepção do vídeo",
+                "baixa qualidade na recepção da informação",
+                "qualidade ruim no vídeo",
+                "vídeo ruim",
+                "cliente com vídeo ruim",
+                "qual cliente tem a pior qualidade de recepção de vídeo ao longo do tempo"
+            ],
 
             # Perguntas relacionadas à QoE mais consistente
-            "qual servidor fornece a QoE mais consistente",
-            "servidor com a menor variação de QoE",
-            "servidor mais estável em QoE",
+            'calculate_most_consistent_server': [
+                "qual servidor fornece a QoE mais consistente",
+                "servidor com a menor variação de QoE",
+                "servidor mais estável em QoE"
+            ],
 
             # Perguntas relacionadas à melhor estratégia de troca de servidor
-            "melhor estratégia de troca de servidor para maximizar a qualidade de experiência do cliente",
-            "qual é a melhor estratégia de troca para o cliente",
-            "como melhorar a experiência do cliente mudando de servidor",
+            'calculate_best_server_switch_strategy': [
+                "melhor estratégia de troca de servidor para maximizar a qualidade de experiência do cliente",
+                "qual é a melhor estratégia de troca para o cliente",
+                "como melhorar a experiência do cliente mudando de servidor"
+            ],
 
             # Perguntas relacionadas ao aumento da latência
-            "se a latência aumentar",
-            "como o aumento da latência afeta a QoE",
-            "efeito do aumento de latência na QoE do cliente",
+            'calculate_qoe_with_increased_latency': [
+                "se a latência aumentar",
+                "como o aumento da latência afeta a QoE",
+                "efeito do aumento de latência na QoE do cliente"
+            ],
 
             # Novas perguntas: tempo médio de latência do cliente
-            "qual é o tempo médio de latência do cliente",
-            "tempo médio de latência para o cliente",
-            "latência média do cliente",
-            
+            'calculate_avg_latency_for_client': [
+                "qual é o tempo médio de latência do cliente",
+                "tempo médio de latência para o cliente",
+                "latência média do cliente"
+            ],
+
             # Novas perguntas: bitrate médio para o servidor
-            "qual é o bitrate médio para o servidor",
-            "bitrate médio para o servidor",
-            "média de bitrate do servidor",
+            'calculate_avg_bitrate_for_server': [
+                "qual é o bitrate médio para o servidor",
+                "bitrate médio para o servidor",
+                "média de bitrate do servidor"
+            ],
 
             # Novas perguntas: maior variação de bitrate do cliente
-            "qual foi a maior variação de bitrate para o cliente",
-            "maior variação de bitrate para o cliente",
-            "variação máxima de bitrate do cliente",
+            'calculate_max_bitrate_variation_for_client': [
+                "qual foi a maior variação de bitrate para o cliente",
+                "maior variação de bitrate para o cliente",
+                "variação máxima de bitrate do cliente"
+            ],
 
             # Novas perguntas: menor latência registrada para o cliente
-            "qual foi a menor latência registrada para o cliente",
-            "menor latência do cliente",
-            "latência mínima registrada para o cliente",
+            'calculate_min_latency_for_client': [
+                "qual foi a menor latência registrada para o cliente",
+                "menor latência do cliente",
+                "latência mínima registrada para o cliente"
+            ],
 
             # Novas perguntas: variação de bitrate médio ao longo do dia para o servidor
-            "como o bitrate médio varia ao longo do dia para o servidor",
-            "variação do bitrate ao longo do dia para o servidor",
-            "bitrate médio do servidor ao longo do dia"
-        ]
+            'calculate_bitrate_variation_for_server': [
+                "como o bitrate médio varia ao longo do dia para o servidor",
+                "variação do bitrate ao longo do dia para o servidor",
+                "bitrate médio do servidor ao longo do dia"
+            ],
+
+            # Novas perguntas: latência do cliente em uma janela recente de tempo
+            'calculate_recent_latency_for_client': [
+                "qual foi a latência do cliente nas últimas horas",
+                "latência média do cliente nas últimas 6 horas",
+                "latência recente do cliente"
+            ]
+        }
+
+        # Frases de referência para identificação de perguntas e a intenção de cada uma
+        self.reference_phrases = [phrase for phrases in self.intent_table.values() for phrase in phrases]
+        self.reference_intents = [intent for intent, phrases in self.intent_table.items() for _ in phrases]
+
+        # Entidade exigida por cada função (None para as que não dependem de cliente ou servidor)
+        self.function_entities = {
+            'calculate_qoe_with_explanation': None,
+            'calculate_most_consistent_server': None,
+            'calculate_best_server_switch_strategy': 'client',
+            'calculate_qoe_with_increased_latency': 'client',
+            'calculate_avg_latency_for_client': 'client',
+            'calculate_avg_bitrate_for_server': 'server',
+            'calculate_max_bitrate_variation_for_client': 'client',
+            'calculate_min_latency_for_client': 'client',
+            'calculate_bitrate_variation_for_server': 'server',
+            'calculate_recent_latency_for_client': 'client'
+        }
 
-        self.reference_embeddings = self.generate_embeddings(self.reference_phrases)
+        # Janela padrão, em horas, das perguntas sobre o período recente
+        self.recent_window_hours = 6
+
+        # Limiar de similaridade para aceitar a pergunta e limiares para o roteamento local (ajustáveis)
+        self.similarity_threshold = 0.86
+        self.routing_threshold = 0.92
+        self.routing_margin = 0.03
+
+        # Penalidade de QoE por troca de servidor no planejamento da frota (ajustável)
+        self.switch_penalty = 1.0
+        self.fleet_plan = None
+        self.fleet_plan_key = None
+        self.fleet_plan_lock = threading.Lock()
+
+        # Pré-análise, índices, entidades conhecidas e embeddings de referência (do snapshot, quando válido)
+        self.initialize_state()
 
         # Inicializar a aplicação Dash
         self.app = dash.Dash(__name__)
@@ -85,20 +230,93 @@ class Main:
         # Configurar o callback
         self.setup_callbacks()
 
-    def preprocess_data(self):
-        # Converter timestamp para granularidade de minuto
-        self.bitrate_data['timestamp'] = pd.to_datetime(self.bitrate_data['timestamp'], unit='s')
-        self.bitrate_data['minute'] = self.bitrate_data['timestamp'].dt.floor('min')
-        
-        self.latency_data['timestamp'] = pd.to_datetime(self.latency_data['timestamp'], unit='s')
-        self.latency_data['minute'] = self.latency_data['timestamp'].dt.floor('min')
+        # Configurar as rotas auxiliares do servidor Flask
+        self.setup_routes()
+        self.ready = True
+
+    @property
+    def client(self):
+        # Cliente da OpenAI envolvido pela camada OpenAIGateway, criado na primeira chamada
+        if self._client is None:
+            with self.client_lock:
+                if self._client is None:
+                    self._client = self.create_gateway(self.injected_client or self.create_openai_client())
+        return self._client
+
+    def create_openai_client(self):
+        # Cria o cliente da OpenAI; o SDK é importado só aqui, fora do caminho de inicialização com cliente injetado
+        import httpx
+        from openai import OpenAI
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=self.max_workers * 2, max_keepalive_connections=self.max_workers),
+            timeout=60.0
+        )
+        # As repetições ficam a cargo da camada OpenAIGateway, que também ajusta a taxa de envio
+        return OpenAI(api_key=self.api_key, http_client=self.http_client, max_retries=0)
+
+    def create_gateway(self, client):
+        # Envolve o cliente da OpenAI; a concorrência acompanha o tamanho do pool de conexões HTTP
+        return OpenAIGateway(client, max_in_flight=self.max_workers * 2, requests_per_second=self.openai_requests_per_second, metrics=self.metrics)
+
+    def initialize_state(self):
+        # Restaura o estado do snapshot se ele corresponde aos hashes dos CSVs e das frases de referência;
+        # caso contrário, realiza a pré-análise completa e grava um novo snapshot
+        sources = [os.path.join(self.data_dir, name) for name in ('bitrate_train.csv', 'rtt_train.csv')]
+        state = load_snapshot(self.snapshot_dir, sources, self.reference_phrases, self.embedding_model)
+        if state is None:
+            # Realizar a pré-análise dos dados
+            self.preprocessed_data = self.preprocess_data()
+
+            # Construir o índice de estatísticas por cliente/servidor usado pelas funções de cálculo
+            self.stats_index = self.build_stats_index()
+
+            # Construir a pirâmide de agregados por minuto / 5 minutos / hora / dia para consultas por intervalo de tempo
+            self.rollups = self.build_rollups()
+
+            state = {
+                'preprocessed_data': self.preprocessed_data,
+                'stats_index': self.stats_index,
+                'rollups': self.rollups,
+                'known_clients': self.stats_index.entity_names('client'),
+                'known_servers': self.stats_index.entity_names('server'),
+                'reference_matrix': normalize_rows(self.generate_embeddings(self.reference_phrases)),
+            }
+            save_snapshot(self.snapshot_dir, sources, self.reference_phrases, self.embedding_model, state)
+
+        self.preprocessed_data = state['preprocessed_data']
+        self.stats_index = state['stats_index']
+        self.rollups = state['rollups']
+
+        # Identificadores conhecidos de clientes e servidores, usados na extração local de entidades
+        self.known_clients = state['known_clients']
+        self.known_servers = state['known_servers']
 
-        # Agrupar por cliente, servidor e minuto, calculando a média
-        bitrate_grouped = self.bitrate_data.groupby(['client', 'server', 'minute'])['bitrate'].mean().reset_index()
-        latency_grouped = self.latency_data.groupby(['client', 'server', 'minute'])['rtt'].mean().reset_index()
+        # Embeddings das frases de referência como matriz float32 de linhas normalizadas
+        self.reference_matrix = state['reference_matrix']
 
-        # Mesclar as duas séries com base em cliente, servidor e minuto
-        merged_data = pd.merge(bitrate_grouped, latency_grouped, on=['client', 'server', 'minute'])
+    @property
+    def preprocessed_data(self):
+        # Quadro pré-processado; após inclusões incrementais é montado a partir do agregador na primeira consulta
+        if self.preprocessed_stale:
+            with self.data_lock:
+                if self.preprocessed_stale:
+                    self._preprocessed_data = self.qoe_aggregator.to_frame()
+                    self.preprocessed_stale = False
+        return self._preprocessed_data
+
+    @preprocessed_data.setter
+    def preprocessed_data(self, preprocessed_data):
+        self._preprocessed_data = preprocessed_data
+        self.preprocessed_stale = False
+
+    def preprocess_data(self):
+        # Agrupar por cliente, servidor e minuto (calculado dos timestamps inteiros, sem alterar as colunas
+        # mapeadas em memória) e mesclar as duas séries; com volume suficiente,
+        # os shards (por cliente ou por faixa de tempo) são agregados em paralelo em um pool de processos
+        if self.preprocess_workers > 1 and len(self.bitrate_data) + len(self.latency_data) >= self.parallel_min_rows:
+            merged_data = aggregate_minute_means_sharded(self.bitrate_data, self.latency_data, self.preprocess_workers)
+        else:
+            merged_data = aggregate_minute_means(self.bitrate_data, self.latency_data)
 
         # Normalizar as colunas de bitrate e latência
         merged_data['Normalized_Bitrate'] = self.normalize_data(merged_data, 'bitrate')
@@ -109,6 +327,75 @@ class Main:
 
         return merged_data
 
+    def build_stats_index(self):
+        # Calcula uma única vez as estatísticas por entidade, janelas de 5 minutos, médias horárias e QoE
+        stats_index = StatsIndex()
+        stats_index.add_bitrate(self.bitrate_data)
+        stats_index.add_latency(self.latency_data)
+        stats_index.set_qoe(self.preprocessed_data)
+        return stats_index
+
+    def append_measurements(self, bitrate_data=None, latency_data=None):
+        # Incorpora novas medições atualizando só os buckets (cliente, servidor, minuto) afetados,
+        # sem refazer a pré-análise completa
+        with self.data_lock:
+            if self.qoe_aggregator is None:
+                self.qoe_aggregator = QoEAggregator()
+                self.qoe_aggregator.append(bitrate_data=self.bitrate_data, latency_data=self.latency_data)
+
+            affected = self.qoe_aggregator.append(bitrate_data=bitrate_data, latency_data=latency_data)
+            if affected is None:
+                return None
+
+            if bitrate_data is not None:
+                self.stats_index.add_bitrate(bitrate_data)
+                self.rollups.add(bitrate_data, 'bitrate')
+            if latency_data is not None:
+                self.stats_index.add_latency(latency_data)
+                self.rollups.add(latency_data, 'rtt')
+
+            # Agregados de QoE: só as entidades dos buckets alterados, a menos que os limites de normalização
+            # tenham mudado (aí toda a QoE mudou). O quadro completo só é montado quando alguém o consulta
+            if self.qoe_aggregator.renormalized:
+                self.stats_index.set_qoe(self.qoe_aggregator.to_frame())
+            else:
+                self.stats_index.update_qoe(*self.qoe_aggregator.changed)
+            self.preprocessed_stale = True
+            self.known_clients = self.stats_index.entity_names('client')
+            self.known_servers = self.stats_index.entity_names('server')
+
+            # Os dados mudaram: avançar a versão e invalidar as explicações armazenadas
+            self.appended_batches += 1
+            self.data_version = f"{self.base_data_version}:{self.appended_batches}"
+            self.explanation_cache.clear()
+            self.answer_cache.clear()
+            return affected
+
+    def tail_measurements(self, csv_path, value_column, poll_interval=1.0, from_start=False):
+        # Acompanha um CSV de medições (bitrate ou rtt) e incorpora as novas linhas à medida que chegam
+        if value_column not in ('bitrate', 'rtt'):
+            raise ValueError(f"Métrica desconhecida: {value_column}")
+
+        def on_rows(rows):
+            if value_column == 'bitrate':
+                self.append_measurements(bitrate_data=rows)
+            else:
+                self.append_measurements(latency_data=rows)
+
+        tailer = CsvTailer(csv_path, on_rows, poll_interval=poll_interval, from_start=from_start)
+        if value_column not in tailer.header:
+            raise ValueError(f"O arquivo {csv_path} não possui a coluna '{value_column}'.")
+        tailer.start()
+        self.tailers.append(tailer)
+        return tailer
+
+    def build_rollups(self):
+        # Agrega as medições uma única vez em várias resoluções de tempo
+        rollups = RollupPyramid()
+        rollups.add(self.bitrate_data, 'bitrate')
+        rollups.add(self.latency_data, 'rtt')
+        return rollups
+
     def normalize_data(self, data, column_name):
         # Normalizar os dados usando normalização min-max
         min_value = data[column_name].min()
@@ -116,20 +403,63 @@ class Main:
         return (data[column_name] - min_value) / (max_value - min_value)
 
     def generate_embeddings(self, texts):
-        # Gera embeddings para uma lista de textos
-        response = self.client.embeddings.create(
-            input=texts,
-            model="text-embedding-ada-002"
-        )
-        return [embedding.embedding for embedding in response.data]
+        # Gera embeddings para uma lista de textos, consultando o cache antes da API
+        embeddings = [self.embedding_cache.get(self.embedding_model, text) for text in texts]
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        self.metrics.record_cache('embedding', hits=len(texts) - sum(embedding is None for embedding in embeddings), misses=len(missing))
+
+        if missing:
+            # Enviar apenas os textos ausentes do cache, em uma única chamada
+            with self.metrics.span('embedding'):
+                response = self.client.embeddings.create(
+                    input=missing,
+                    model=self.embedding_model
+                )
+            fetched = {
+                text: self.embedding_cache.put(self.embedding_model, text, item.embedding)
+                for text, item in zip(missing, response.data)
+            }
+            embeddings = [fetched[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+
+        return embeddings
 
     def find_most_similar(self, question_embedding):
-        # Calcula a similaridade entre a pergunta e as frases de referência
-        similarities = cosine_similarity([question_embedding], self.reference_embeddings)
+        # Calcula a similaridade de cosseno entre a pergunta e as frases de referência (produto escalar de vetores normalizados)
+        similarities = self.reference_matrix @ normalize_rows([question_embedding])[0]
         most_similar_index = np.argmax(similarities)
-        most_similar_score = similarities[0][most_similar_index]
+        most_similar_score = similarities[most_similar_index]
         return self.reference_phrases[most_similar_index], most_similar_score
 
+    def route_question(self, question_embedding):
+        # Identifica a intenção mais provável e a margem para a melhor intenção concorrente
+        similarities = self.reference_matrix @ normalize_rows([question_embedding])[0]
+        best_score_by_intent = {}
+        for intent, score in zip(self.reference_intents, similarities):
+            best_score_by_intent[intent] = max(score, best_score_by_intent.get(intent, -1.0))
+        ranked = sorted(best_score_by_intent.items(), key=lambda item: item[1], reverse=True)
+        best_intent, best_score = ranked[0]
+        runner_up_score = ranked[1][1] if len(ranked) > 1 else -1.0
+        return best_intent, best_score, best_score - runner_up_score
+
+    def extract_hours(self, question):
+        # Extrai a janela de tempo ("últimas 6 horas") da pergunta, se houver
+        match = re.search(r'(\d+)\s*horas?', question.lower())
+        return int(match.group(1)) if match else None
+
+    def extract_entities(self, question):
+        # Extrai localmente o cliente e o servidor comparando as palavras com os identificadores conhecidos
+        words = re.findall(r'\w+', question.lower())
+        client_name = next((word for word in words if word in self.known_clients), None)
+        server_name = next((word for word in words if word in self.known_servers), None)
+
+        # Sem correspondência, usar o texto após "cliente"/"servidor" para informar que não foi encontrado
+        if client_name is None and server_name is None:
+            if 'cliente' in question:
+                client_name = question.split("cliente")[-1].strip().lower().replace("?", "")
+            elif 'servidor' in question:
+                server_name = question.split("servidor")[-1].strip().lower().replace("?", "")
+        return client_name, server_name
+
     def create_layout(self):
         # Cria o layout da aplicação Dash
         return html.Div(
@@ -153,7 +483,9 @@ class Main:
                         ),
                         html.Button('Enviar', id='submit-button', n_clicks=0,
                                     style={'marginTop': '20px', 'padding': '10px 20px', 'borderRadius': '5px', 'backgroundColor': '#1f77b4', 'color': 'white', 'border': 'none', 'cursor': 'pointer'}),
-                        html.Div(id='status-message', style={'marginTop': '10px', 'fontSize': '14px', 'color': '#888'})
+                        html.Div(id='status-message', style={'marginTop': '10px', 'fontSize': '14px', 'color': '#888'}),
+                        dcc.Store(id='job-id'),
+                        dcc.Interval(id='poll-interval', interval=250, disabled=True)
                     ]
                 ),
                 html.Div(
@@ -167,43 +499,227 @@ class Main:
         )
 
     def setup_callbacks(self):
-        # Configura os callbacks para a aplicação Dash
+        # Configura os callbacks para a aplicação Dash: o envio agenda a pergunta no executor
+        # e o intervalo consulta o resultado, sem prender o worker durante as chamadas à API
         @self.app.callback(
             Output('output-response', 'children'),
             Output('status-message', 'children'),
-            [Input('submit-button', 'n_clicks')],
-            [State('input-question', 'value')]
+            Output('job-id', 'data'),
+            Output('poll-interval', 'disabled'),
+            [Input('submit-button', 'n_clicks'), Input('poll-interval', 'n_intervals')],
+            [State('input-question', 'value'), State('job-id', 'data')]
         )
-        def process_question(n_clicks, question):
+        def process_question(n_clicks, n_intervals, question, job_id):
+            if dash.callback_context.triggered_id == 'poll-interval':
+                # Um intervalo sem trabalho (por exemplo, uma consulta atrasada) não altera nada na tela
+                if not job_id:
+                    return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+                result = self.poll_question(job_id)
+                if result is None:
+                    # Exibir a resposta parcial recebida até agora
+                    partial = self.question_progress(job_id)
+                    return partial or dash.no_update, "Gerando a resposta...", job_id, False
+                answer, status_message = result
+                return answer, status_message, None, True
             if n_clicks > 0 and question:
-                status_message = "Processando a pergunta..."
-                try:
-                    # Obter o embedding da pergunta
-                    question_embedding = self.generate_embeddings([question])[0]
-                    most_similar_phrase, most_similar_score = self.find_most_similar(question_embedding)
+                # Uma nova pergunta substitui a anterior ainda em andamento nesta aba
+                if job_id:
+                    self.discard_job(job_id)
+                job_id = self.submit_question(question)
+                return "", "Processando a pergunta...", job_id, False
+            return "Por favor, insira uma pergunta e clique em 'Enviar'.", "", None, True
 
-                    # Definir um limiar de similaridade; por exemplo, 0.86 (ajustável)
-                    similarity_threshold = 0.86
+    def setup_routes(self):
+        # Rota de métricas no formato de texto do Prometheus
+        @self.app.server.route('/metrics')
+        def metrics():
+            return Response(self.metrics.render(), mimetype='text/plain; version=0.0.4')
 
-                    if most_similar_score >= similarity_threshold:
-                        # Utilizar function calling com GPT
-                        return self.process_question_with_function_calling(question)
-                    else:
-                        answer = "Desculpe, não tenho a resposta para essa pergunta. Minha funcionalidade está limitada a analisar a qualidade de experiência na recepção de vídeo."
+        # Verificações de vida e de prontidão para o balanceador / orquestrador
+        @self.app.server.route('/healthz')
+        def healthz():
+            return Response(json.dumps({'status': 'ok', 'pid': os.getpid()}), mimetype='application/json')
 
-                    status_message = "Pergunta processada com sucesso."
-                    return answer, status_message
-                except Exception as e:
-                    status_message = "Erro ao processar a pergunta."
-                    return f"Erro: {e}", status_message
-            return "Por favor, insira uma pergunta e clique em 'Enviar'.", ""
+        @self.app.server.route('/readyz')
+        def readyz():
+            ready = self.ready and self.reference_matrix is not None and self._preprocessed_data is not None
+            body = {'ready': ready, 'pid': os.getpid(), 'data_version': self.data_version}
+            return Response(json.dumps(body), status=200 if ready else 503, mimetype='application/json')
+
+    def submit_question(self, question):
+        # Agenda o processamento da pergunta e devolve o identificador do trabalho
+        self.evict_jobs()
+        job_id = uuid.uuid4().hex
+        if self.shared_jobs is None:
+            progress = AnswerProgress()
+            self.add_job(job_id, self.executor.submit(self.answer_question_streaming, question, progress), progress)
+            return job_id
+
+        # Publicar o andamento e o resultado no armazenamento compartilhado entre os workers
+        progress = AnswerProgress(on_change=lambda text: self.shared_jobs.publish_progress(job_id, text))
+        self.shared_jobs.publish_progress(job_id, "", force=True)
+        self.add_job(job_id, self.executor.submit(self.answer_shared_job, job_id, question, progress), progress)
+        return job_id
+
+    def add_job(self, job_id, future, progress):
+        # Registra o trabalho com o instante de criação; o de conclusão é anotado quando ele termina
+        with self.jobs_lock:
+            self.jobs[job_id] = (future, progress, time.monotonic(), None)
+        future.add_done_callback(lambda finished: self.finish_job(job_id, finished))
+
+    def finish_job(self, job_id, future):
+        # Anota o instante de conclusão, a partir do qual o resultado fica disponível por job_result_ttl segundos
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job[0] is future:
+                self.jobs[job_id] = job[:3] + (time.monotonic(),)
+
+    def discard_job(self, job_id):
+        # Esquece o trabalho; se ainda estiver em andamento, seu resultado é descartado ao terminar
+        with self.jobs_lock:
+            self.jobs.pop(job_id, None)
+
+    def evict_jobs(self):
+        # Remove os trabalhos que ninguém mais vai consultar: resultados lidos ou não são mantidos por
+        # job_result_ttl segundos após a conclusão, para que consultas sobrepostas recebam a mesma resposta
+        now = time.monotonic()
+        with self.jobs_lock:
+            for job_id, (_, _, created_at, finished_at) in list(self.jobs.items()):
+                if now - created_at > self.job_max_age or (finished_at is not None and now - finished_at > self.job_result_ttl):
+                    del self.jobs[job_id]
+        if self.shared_jobs is not None:
+            self.shared_jobs.evict(self.job_result_ttl)
+
+    def answer_shared_job(self, job_id, question, progress):
+        # Processa a pergunta e publica o resultado; a partir daí qualquer worker o lê do armazenamento
+        # compartilhado, então a entrada local é descartada para não acumular trabalhos nunca consultados aqui
+        result = self.answer_question_streaming(question, progress)
+        self.shared_jobs.publish_result(job_id, result)
+        self.discard_job(job_id)
+        return result
+
+    def poll_question(self, job_id):
+        # Retorna (resposta, status) quando o trabalho terminou, ou None se ainda está em andamento
+        job = self.jobs.get(job_id)
+        if job is None and self.shared_jobs is not None:
+            # Trabalho iniciado em outro worker: consultar o estado publicado
+            entry = self.shared_jobs.read(job_id)
+            if entry is not None:
+                if not entry['done']:
+                    return None
+                return tuple(entry['result'])
+        if job is None:
+            return "Erro: pergunta não encontrada.", "Erro ao processar a pergunta."
+        future = job[0]
+        if not future.done():
+            return None
+        return future.result()
+
+    def question_progress(self, job_id):
+        # Texto parcial da resposta em andamento
+        job = self.jobs.get(job_id)
+        if job is None and self.shared_jobs is not None:
+            entry = self.shared_jobs.read(job_id)
+            return entry.get('text', "") if entry is not None else ""
+        return job[1].text() if job is not None else ""
+
+    def answer_question_streaming(self, question, progress):
+        # Processa a pergunta publicando a resposta parcial em progress à medida que é gerada
+        self.local.progress = progress
+        try:
+            return self.answer_question(question)
+        finally:
+            self.local.progress = None
+
+    def answer_question(self, question):
+        # Processa uma pergunta completa e retorna (resposta, status), registrando o trace da requisição
+        self.metrics.start_trace(question)
+        status_message = "Erro ao processar a pergunta."
+        try:
+            with self.metrics.span('request', exclusive=False):
+                answer, status_message = self.compute_answer(question)
+            return answer, status_message
+        finally:
+            self.metrics.finish_trace(status_message)
+
+    def compute_answer(self, question):
+        # Identifica a intenção da pergunta e produz a resposta
+        try:
+            # Obter o embedding da pergunta
+            question_embedding = self.generate_embeddings([question])[0]
+            with self.metrics.span('routing'):
+                intent, most_similar_score, margin = self.route_question(question_embedding)
+
+            if most_similar_score < self.similarity_threshold:
+                answer = "Desculpe, não tenho a resposta para essa pergunta. Minha funcionalidade está limitada a analisar a qualidade de experiência na recepção de vídeo."
+                status_message = "Pergunta processada com sucesso."
+                return answer, status_message
+
+            # Paráfrase de uma pergunta já respondida no mesmo escopo: reutilizar a resposta
+            scope = self.answer_scope(question, intent)
+            cached = self.answer_cache.get(question_embedding, scope)
+            self.metrics.record_cache('semantic_answer', hits=int(cached is not None), misses=int(cached is None))
+            if cached is not None:
+                return cached
+
+            if most_similar_score >= self.routing_threshold and margin >= self.routing_margin:
+                # Correspondência confiável: chamar a função diretamente, sem consultar o GPT
+                client_name, server_name = self.extract_entities(question)
+                result = self.dispatch_function(intent, client_name, server_name, self.extract_hours(question))
+            else:
+                # Correspondência ambígua: utilizar function calling com GPT
+                result = self.process_question_with_function_calling(question)
+            self.remember_answer(question_embedding, scope, result)
+            return result
+        except Exception as e:
+            status_message = "Erro ao processar a pergunta."
+            return f"Erro: {e}", status_message
+
+    def answer_scope(self, question, intent):
+        # Escopo em que uma resposta pode ser reutilizada: intenção mais próxima, entidades extraídas,
+        # janela de tempo e versão dos dados
+        client_name, server_name = self.extract_entities(question)
+        return (
+            intent,
+            client_name and client_name.lower(),
+            server_name and server_name.lower(),
+            self.extract_hours(question),
+            self.data_version
+        )
+
+    def remember_answer(self, question_embedding, scope, result):
+        # Armazena no cache semântico apenas as respostas processadas com sucesso
+        if result[1] == "Pergunta processada com sucesso." and not result[0].startswith("Erro"):
+            self.answer_cache.put(question_embedding, scope, result)
 
     def process_question_with_function_calling(self, question):
+        # Usar GPT para decidir qual função chamar e executá-la
+        suggested_function, client_name, server_name, hours = self.select_function(question)
+        return self.dispatch_function(suggested_function, client_name, server_name, hours)
+
+    def select_function(self, question):
         # Usar GPT para analisar a pergunta e decidir qual função chamar
-        response = self.client.chat.completions.create(
+        with self.metrics.span('function_calling'):
+            response = self.create_function_call(question)
+
+        # Decodificar a função sugerida pelo GPT
+        suggested_function = response.choices[0].message.function_call.name
+
+        # Extração do nome do cliente ou servidor, se aplicável
+        client_name, server_name = self.extract_entities(question)
+
+        # Adicionar uma verificação manual para perguntas específicas
+        if "tempo médio de latência" in question:
+            suggested_function = 'calculate_avg_latency_for_client'
+
+        return suggested_function, client_name, server_name, self.extract_hours(question)
+
+    def create_function_call(self, question):
+        # Chamada de function calling ao GPT com as funções disponíveis
+        return self.client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": "Você é um assistente especializado em análise de qualidade de experiência (QoE). Aqui estão as funções disponíveis: 'calculate_qoe_with_explanation', 'calculate_most_consistent_server', 'calculate_best_server_switch_strategy', 'calculate_qoe_with_increased_latency', 'calculate_avg_latency_for_client', 'calculate_avg_bitrate_for_server', 'calculate_max_bitrate_variation_for_client', 'calculate_min_latency_for_client', 'calculate_bitrate_variation_for_server'."},
+                {"role": "system", "content": "Você é um assistente especializado em análise de qualidade de experiência (QoE). Aqui estão as funções disponíveis: 'calculate_qoe_with_explanation', 'calculate_most_consistent_server', 'calculate_best_server_switch_strategy', 'calculate_qoe_with_increased_latency', 'calculate_avg_latency_for_client', 'calculate_avg_bitrate_for_server', 'calculate_max_bitrate_variation_for_client', 'calculate_min_latency_for_client', 'calculate_bitrate_variation_for_server', 'calculate_recent_latency_for_client'."},
                 {"role": "user", "content": question}
             ],
             functions=[
@@ -215,31 +731,90 @@ class Main:
                 {"name": "calculate_avg_bitrate_for_server", "description": "Calcula o bitrate médio para um servidor específico."},
                 {"name": "calculate_max_bitrate_variation_for_client", "description": "Calcula a maior variação de bitrate para um cliente específico em intervalos de 5 minutos."},
                 {"name": "calculate_min_latency_for_client", "description": "Calcula a menor latência registrada para um cliente específico."},
-                {"name": "calculate_bitrate_variation_for_server", "description": "Calcula a variação do bitrate médio ao longo do dia para um servidor específico."}
+                {"name": "calculate_bitrate_variation_for_server", "description": "Calcula a variação do bitrate médio ao longo do dia para um servidor específico."},
+                {"name": "calculate_recent_latency_for_client", "description": "Calcula a latência média, mínima e máxima de um cliente específico nas últimas horas."}
             ],
             max_tokens=500,
             temperature=0.4
         )
 
-        # Decodificar a função sugerida pelo GPT
-        suggested_function = response.choices[0].message.function_call.name
-        client_name = None
-        server_name = None
+    def answer_batch(self, questions, max_concurrency=8):
+        # Responde uma lista de perguntas: um único pedido de embeddings, agrupamento das perguntas que
+        # chamam a mesma função para a mesma entidade e concorrência limitada nas chamadas ao GPT
+        results = [None] * len(questions)
+        try:
+            embeddings = self.generate_embeddings(questions) if questions else []
+        except Exception as e:
+            # Sem embeddings não há roteamento: cada pergunta recebe sua linha de erro
+            return [(f"Erro: {e}", "Erro ao processar a pergunta.") for _ in questions]
 
-        # Extração do nome do cliente ou servidor, se aplicável
-        if 'cliente' in question:
-            client_name = question.split("cliente")[-1].strip().lower().replace("?", "")
-        elif 'servidor' in question:
-            server_name = question.split("servidor")[-1].strip().lower().replace("?", "")
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='batch') as pool:
+            # Identificar a função de cada pergunta, consultando o GPT apenas nos casos ambíguos
+            routes = {}
+            pending = {}
+            scopes = {}
+            for i, (question, question_embedding) in enumerate(zip(questions, embeddings)):
+                intent, most_similar_score, margin = self.route_question(question_embedding)
+                if most_similar_score < self.similarity_threshold:
+                    results[i] = ("Desculpe, não tenho a resposta para essa pergunta. Minha funcionalidade está limitada a analisar a qualidade de experiência na recepção de vídeo.", "Pergunta processada com sucesso.")
+                    continue
 
-        # Adicionar uma verificação manual para perguntas específicas
-        if "tempo médio de latência" in question and client_name:
-            if client_name in self.latency_data['client'].str.lower().unique():
-                return self.calculate_avg_latency_for_client(client_name), "Pergunta processada com sucesso."
-            else:
-                return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
-        elif suggested_function == 'calculate_avg_latency_for_client' and client_name:
-            if client_name in self.latency_data['client'].str.lower().unique():
+                # Paráfrases já respondidas não precisam de roteamento nem de cálculo
+                scopes[i] = self.answer_scope(question, intent)
+                cached = self.answer_cache.get(question_embedding, scopes[i])
+                self.metrics.record_cache('semantic_answer', hits=int(cached is not None), misses=int(cached is None))
+                if cached is not None:
+                    results[i] = cached
+                elif most_similar_score >= self.routing_threshold and margin >= self.routing_margin:
+                    routes[i] = (intent, *self.extract_entities(question), self.extract_hours(question))
+                else:
+                    pending[i] = pool.submit(self.select_function, question)
+            for i, future in pending.items():
+                try:
+                    routes[i] = future.result()
+                except Exception as e:
+                    results[i] = (f"Erro: {e}", "Erro ao processar a pergunta.")
+
+            # Executar cada combinação (função, entidade, janela) uma única vez
+            groups = {}
+            for i, (function_name, client_name, server_name, hours) in routes.items():
+                entity = self.function_entities.get(function_name)
+                client_name = client_name if entity == 'client' else None
+                server_name = server_name if entity == 'server' else None
+                hours = hours if function_name == 'calculate_recent_latency_for_client' else None
+                key = (function_name, client_name and client_name.lower(), server_name and server_name.lower(), hours)
+                groups.setdefault(key, []).append(i)
+            futures = {key: pool.submit(self.dispatch_function, *key) for key in groups}
+            for key, indexes in groups.items():
+                try:
+                    result = futures[key].result()
+                except Exception as e:
+                    result = (f"Erro: {e}", "Erro ao processar a pergunta.")
+                for i in indexes:
+                    results[i] = result
+                    self.remember_answer(embeddings[i], scopes[i], result)
+        return results
+
+    def process_question_file(self, input_path, output_path, max_concurrency=8):
+        # Lê perguntas em JSONL ({"question": ...} e, opcionalmente, "id") e grava as respostas em JSONL
+        with open(input_path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        results = self.answer_batch([record['question'] for record in records], max_concurrency=max_concurrency)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for i, (record, (answer, status_message)) in enumerate(zip(records, results)):
+                output = {'id': record.get('id', i), 'question': record['question'], 'answer': answer, 'status': status_message}
+                f.write(json.dumps(output, ensure_ascii=False) + "\n")
+        return len(records)
+
+    def dispatch_function(self, suggested_function, client_name, server_name, hours=None):
+        # Chama a função de cálculo correspondente à intenção identificada, medindo o tempo da etapa
+        with self.metrics.span('calculate', function=suggested_function or 'none'):
+            return self.call_function(suggested_function, client_name, server_name, hours)
+
+    def call_function(self, suggested_function, client_name, server_name, hours=None):
+        # Verifica a entidade e executa a função de cálculo
+        if suggested_function == 'calculate_avg_latency_for_client' and client_name:
+            if self.stats_index.resolve('rtt', 'client', client_name):
                 return self.calculate_avg_latency_for_client(client_name), "Pergunta processada com sucesso."
             else:
                 return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
@@ -249,35 +824,40 @@ class Main:
         elif suggested_function == 'calculate_most_consistent_server':
             return self.calculate_most_consistent_server(), "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_best_server_switch_strategy' and client_name:
-            if client_name in self.preprocessed_data['client'].unique():
+            if self.stats_index.resolve('qoe', 'client', client_name):
                 return self.calculate_best_server_switch_strategy(client_name), "Pergunta processada com sucesso."
             else:
                 return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_qoe_with_increased_latency' and client_name:
-            if client_name in self.preprocessed_data['client'].unique():
+            if self.stats_index.resolve('qoe', 'client', client_name):
                 return self.calculate_qoe_with_increased_latency(client_name), "Pergunta processada com sucesso."
             else:
                 return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_avg_bitrate_for_server' and server_name:
-            if server_name in self.bitrate_data['server'].str.lower().unique():
+            if self.stats_index.resolve('bitrate', 'server', server_name):
                 return self.calculate_avg_bitrate_for_server(server_name), "Pergunta processada com sucesso."
             else:
                 return f"Servidor {server_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_max_bitrate_variation_for_client' and client_name:
-            if client_name in self.bitrate_data['client'].str.lower().unique():
+            if self.stats_index.resolve('bitrate', 'client', client_name):
                 return self.calculate_max_bitrate_variation_for_client(client_name), "Pergunta processada com sucesso."
             else:
                 return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_min_latency_for_client' and client_name:
-            if client_name in self.latency_data['client'].str.lower().unique():
+            if self.stats_index.resolve('rtt', 'client', client_name):
                 return self.calculate_min_latency_for_client(client_name), "Pergunta processada com sucesso."
             else:
                 return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         elif suggested_function == 'calculate_bitrate_variation_for_server' and server_name:
-            if server_name in self.bitrate_data['server'].str.lower().unique():
+            if self.stats_index.resolve('bitrate', 'server', server_name):
                 return self.calculate_bitrate_variation_for_server(server_name), "Pergunta processada com sucesso."
             else:
                 return f"Servidor {server_name} não encontrado nos dados.", "Pergunta processada com sucesso."
+        elif suggested_function == 'calculate_recent_latency_for_client' and client_name:
+            if self.stats_index.resolve('rtt', 'client', client_name):
+                return self.calculate_recent_latency_for_client(client_name, hours), "Pergunta processada com sucesso."
+            else:
+                return f"Cliente {client_name} não encontrado nos dados.", "Pergunta processada com sucesso."
         else:
             return "Desculpe, não consegui identificar a ação correta a ser tomada.", "Pergunta não reconhecida."
 
@@ -285,13 +865,14 @@ class Main:
 
 
     def calculate_qoe_with_explanation(self):
-        # Calcular a QoE para cada cliente e determinar o cliente com a menor média
-        grouped_data = self.preprocessed_data.groupby('client')['QoE'].mean()
+        # Consultar a QoE média por cliente no índice e determinar o cliente com a menor média
+        grouped_data = self.stats_index.client_qoe_mean
         worst_client = grouped_data.idxmin()
         worst_client_qoe = grouped_data.min()
 
         # Informação principal
         main_info = f"O cliente com a pior qualidade de recepção de vídeo é: {worst_client}."
+        self.publish_main_info(main_info)
 
         # Solicitar uma explicação ao GPT
         explanation_prompt = (
@@ -303,13 +884,14 @@ class Main:
         return f"{main_info} {explanation}"
 
     def calculate_most_consistent_server(self):
-        # Calcular a variância da QoE para cada servidor e identificar o servidor mais consistente
-        server_variance = self.preprocessed_data.groupby('server')['QoE'].var()
+        # Consultar a variância da QoE por servidor no índice e identificar o servidor mais consistente
+        server_variance = self.stats_index.server_qoe_var
         most_consistent_server = server_variance.idxmin()
         lowest_variance = server_variance.min()
 
         # Informação principal
         main_info = f"O servidor que fornece a QoE mais consistente é: {most_consistent_server}."
+        self.publish_main_info(main_info)
 
         # Solicitar uma explicação ao GPT
         explanation_prompt = (
@@ -322,34 +904,61 @@ class Main:
 
     def calculate_best_server_switch_strategy(self, client_name):
         # Verificar se o cliente existe nos dados
-        if client_name not in self.preprocessed_data['client'].unique():
+        client_id = self.stats_index.resolve('qoe', 'client', client_name)
+        if client_id is None:
             return f"Cliente {client_name} não encontrado nos dados."
 
-        # Filtrar os dados para o cliente especificado
-        client_data = self.preprocessed_data[self.preprocessed_data['client'] == client_name]
-
-        # Encontrar o melhor servidor para cada timestamp com base na maior QoE
-        best_servers = client_data.loc[client_data.groupby('minute')['QoE'].idxmax()]
-
-        # Informação principal
-        main_info = f"O melhor plano de troca de servidor para maximizar a QoE do cliente {client_name} foi identificado."
-
-        # Solicitar uma explicação ao GPT
+        # Solicitar uma explicação ao GPT em paralelo ao cálculo, pois o prompt não depende do resultado
         explanation_prompt = (
-            f"O plano de troca foi derivado identificando o servidor com a melhor qualidade de experiência (QoE) para cada minuto, "
+            f"O plano de troca foi derivado escolhendo, para cada minuto, o servidor que maximiza a qualidade de experiência (QoE) "
+            f"acumulada, descontando uma penalidade de {self.switch_penalty} por troca de servidor para evitar trocas excessivas, "
             f"permitindo otimizar a qualidade de recepção de vídeo para o cliente {client_name}. Explique de forma detalhada como "
             f"esse plano de troca maximiza a qualidade da experiência."
         )
-        explanation = self.generate_gpt_explanation(explanation_prompt)
+        explanation_future = self.submit_io(self.generate_gpt_explanation, explanation_prompt)
+
+        # Consultar o plano de troca calculado para toda a frota
+        plan, summary = self.plan_fleet_switches()
+        client_summary = summary.loc[str(client_id)]
+
+        # Informação principal
+        main_info = (
+            f"O melhor plano de troca de servidor para maximizar a QoE do cliente {client_name} foi identificado: "
+            f"{int(client_summary['switches'])} trocas em {int(client_summary['minutes'])} minutos, com QoE média de "
+            f"{client_summary['plan_qoe']:.4f} (ganho esperado de {client_summary['expected_gain']:.4f} sobre a média observada)."
+        )
+        self.publish_main_info(main_info)
+
+        with self.metrics.span('explanation_wait'):
+            explanation = explanation_future.result()
         return f"{main_info} {explanation}"
 
+    def plan_fleet_switches(self, switch_penalty=None):
+        # Plano de troca de servidor de todos os clientes em uma única passagem vetorizada,
+        # reaproveitado enquanto os dados e a penalidade não mudarem
+        switch_penalty = self.switch_penalty if switch_penalty is None else switch_penalty
+        key = (self.data_version, switch_penalty)
+        with self.fleet_plan_lock:
+            if self.fleet_plan_key != key:
+                self.fleet_plan = plan_fleet(self.preprocessed_data, switch_penalty)
+                self.fleet_plan_key = key
+            return self.fleet_plan
+
     def calculate_qoe_with_increased_latency(self, client_name):
         # Verificar se o cliente existe nos dados
-        if client_name not in self.preprocessed_data['client'].unique():
+        client_id = self.stats_index.resolve('qoe', 'client', client_name)
+        if client_id is None:
             return f"Cliente {client_name} não encontrado nos dados."
 
-        # Filtrar os dados para o cliente especificado
-        client_data = self.preprocessed_data[self.preprocessed_data['client'] == client_name].copy()
+        # Solicitar uma explicação ao GPT em paralelo ao cálculo, pois o prompt não depende do resultado
+        explanation_prompt = (
+            f"Após aumentar a latência do cliente {client_name} em 20%, a qualidade de experiência (QoE) foi recalculada. "
+            f"Explique como essa mudança na latência impacta a QoE do cliente, destacando qualquer mudança significativa nos resultados."
+        )
+        explanation_future = self.submit_io(self.generate_gpt_explanation, explanation_prompt)
+
+        # Obter os dados do cliente a partir do índice
+        client_data = self.stats_index.client_frames[client_id].copy()
 
         # Aumentar a latência em 20%
         client_data['Increased_Latency'] = client_data['rtt'] * 1.20
@@ -362,97 +971,176 @@ class Main:
 
         # Informação principal
         main_info = f"A QoE do cliente {client_name} foi recalculada após aumentar a latência em 20%."
+        self.publish_main_info(main_info)
 
-        # Solicitar uma explicação ao GPT
-        explanation_prompt = (
-            f"Após aumentar a latência do cliente {client_name} em 20%, a qualidade de experiência (QoE) foi recalculada. "
-            f"Explique como essa mudança na latência impacta a QoE do cliente, destacando qualquer mudança significativa nos resultados."
-        )
-        explanation = self.generate_gpt_explanation(explanation_prompt)
+        with self.metrics.span('explanation_wait'):
+            explanation = explanation_future.result()
         return f"{main_info} {explanation}"
     
     def calculate_avg_latency_for_client(self, client_name):
         # Verificar se o cliente existe nos dados
-        if client_name not in self.latency_data['client'].unique():
+        client_id = self.stats_index.resolve('rtt', 'client', client_name)
+        if client_id is None:
             return f"Cliente {client_name} não encontrado nos dados."
         
-        # Filtrar os dados para o cliente especificado
-        client_latency_data = self.latency_data[self.latency_data['client'] == client_name]
-        
-        # Calcular a média da latência
-        avg_latency = client_latency_data['latency'].mean()
+        # Consultar a média da latência no índice
+        avg_latency = self.stats_index.get('rtt', 'client', client_id)['mean']
         return f"O tempo médio de latência do cliente {client_name} é {avg_latency:.2f} ms."
 
     def calculate_avg_bitrate_for_server(self, server_name):
         # Verificar se o servidor existe nos dados
-        if server_name not in self.bitrate_data['server'].unique():
+        server_id = self.stats_index.resolve('bitrate', 'server', server_name)
+        if server_id is None:
             return f"Servidor {server_name} não encontrado nos dados."
         
-        # Filtrar os dados para o servidor especificado
-        server_bitrate_data = self.bitrate_data[self.bitrate_data['server'] == server_name]
-        
-        # Calcular a média do bitrate
-        avg_bitrate = server_bitrate_data['bitrate'].mean()
+        # Consultar a média do bitrate no índice
+        avg_bitrate = self.stats_index.get('bitrate', 'server', server_id)['mean']
         return f"O bitrate médio para o servidor {server_name} é {avg_bitrate:.2f} kbps."
 
     def calculate_max_bitrate_variation_for_client(self, client_name):
         # Verificar se o cliente existe nos dados
-        if client_name not in self.bitrate_data['client'].unique():
+        client_id = self.stats_index.resolve('bitrate', 'client', client_name)
+        if client_id is None:
             return f"Cliente {client_name} não encontrado nos dados."
         
-        # Filtrar os dados para o cliente especificado
-        client_bitrate_data = self.bitrate_data[self.bitrate_data['client'] == client_name]
-        
-        # Agrupar os dados por intervalos de 5 minutos e calcular a variação máxima
-        client_bitrate_data['minute'] = pd.to_datetime(client_bitrate_data['timestamp'], unit='s').dt.floor('5min')
-        grouped_bitrate = client_bitrate_data.groupby('minute')['bitrate'].apply(lambda x: x.max() - x.min())
-        
-        # Encontrar a maior variação
-        max_variation = grouped_bitrate.max()
+        # Consultar a maior variação entre os agregados de 5 minutos, mantida pela pirâmide a cada inclusão
+        max_variation = self.rollups.max_range('bitrate', 'client', client_id, granularity='5min')
         return f"A maior variação de bitrate para o cliente {client_name} em um intervalo de 5 minutos é {max_variation:.2f} kbps."
 
     def calculate_min_latency_for_client(self, client_name):
         # Verificar se o cliente existe nos dados
-        if client_name not in self.latency_data['client'].unique():
+        client_id = self.stats_index.resolve('rtt', 'client', client_name)
+        if client_id is None:
             return f"Cliente {client_name} não encontrado nos dados."
         
-        # Filtrar os dados para o cliente especificado
-        client_latency_data = self.latency_data[self.latency_data['client'] == client_name]
-        
-        # Encontrar a menor latência
-        min_latency = client_latency_data['latency'].min()
+        # Consultar a menor latência no índice
+        min_latency = self.stats_index.get('rtt', 'client', client_id)['min']
         return f"A menor latência registrada para o cliente {client_name} é {min_latency:.2f} ms."
 
     def calculate_bitrate_variation_for_server(self, server_name):
         # Verificar se o servidor existe nos dados
-        if server_name not in self.bitrate_data['server'].unique():
+        server_id = self.stats_index.resolve('bitrate', 'server', server_name)
+        if server_id is None:
             return f"Servidor {server_name} não encontrado nos dados."
         
-        # Filtrar os dados para o servidor especificado
-        server_bitrate_data = self.bitrate_data[self.bitrate_data['server'] == server_name]
-        
-        # Converter timestamp para granularidade de hora
-        server_bitrate_data['hour'] = pd.to_datetime(server_bitrate_data['timestamp'], unit='s').dt.hour
-        
-        # Agrupar por hora e calcular a média do bitrate
-        hourly_bitrate_avg = server_bitrate_data.groupby('hour')['bitrate'].mean()
+        # Consultar as médias por hora do dia, mantidas pela pirâmide a cada inclusão
+        hourly_bitrate_avg = self.rollups.hourly_means('bitrate', 'server', server_id)
         
         # Resumir as variações ao longo do dia
-        return f"As variações de bitrate médio ao longo do dia para o servidor {server_name} são: {hourly_bitrate_avg.to_dict()}."
+        return f"As variações de bitrate médio ao longo do dia para o servidor {server_name} são: {hourly_bitrate_avg}."
 
-    def generate_gpt_explanation(self, prompt):
-        # Usar a API da OpenAI para gerar uma explicação detalhada, limitando a 300 tokens
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "Você é um assistente especializado em análise de qualidade de experiência (QoE)."},
-                {"role": "system", "content": "Responda de forma clara, usando no máximo 300 tokens."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.4
+    def calculate_recent_latency_for_client(self, client_name, hours=None):
+        # Verificar se o cliente existe nos dados
+        client_id = self.stats_index.resolve('rtt', 'client', client_name)
+        if client_id is None:
+            return f"Cliente {client_name} não encontrado nos dados."
+
+        # Combinar os agregados que cobrem as últimas horas, contadas a partir da medição de RTT mais recente
+        hours = hours or self.recent_window_hours
+        end = self.rollups.latest['rtt']
+        summary = self.rollups.summarize('rtt', 'client', client_id, end - pd.Timedelta(hours=hours), end)
+        if summary['count'] == 0:
+            return f"Não há medições de latência do cliente {client_name} nas últimas {hours} horas."
+        return (
+            f"Nas últimas {hours} horas (até {end:%d/%m/%Y %H:%M}), a latência do cliente {client_name} teve média de "
+            f"{summary['mean']:.2f} ms, mínima de {summary['min']:.2f} ms e máxima de {summary['max']:.2f} ms "
+            f"em {summary['count']} medições."
         )
-        return response.choices[0].message.content.strip()
+
+    def generate_gpt_explanation(self, prompt, progress=None):
+        # Usar a API da OpenAI para gerar uma explicação detalhada, limitando a 300 tokens
+        progress = progress or self.current_progress()
+        model = "gpt-4o-mini"
+        temperature = 0.4
+        messages = [
+            {"role": "system", "content": "Você é um assistente especializado em análise de qualidade de experiência (QoE)."},
+            {"role": "system", "content": "Responda de forma clara, usando no máximo 300 tokens."},
+            {"role": "user", "content": prompt}
+        ]
+
+        # Reutilizar a explicação se o mesmo prompt já foi respondido para a mesma versão dos dados
+        cache_key = self.explanation_cache.make_key(model, messages[:-1], prompt, temperature, self.data_version)
+        explanation = self.explanation_cache.get(cache_key)
+        if explanation is not None:
+            self.metrics.record_cache('explanation', hits=1)
+            if progress is not None:
+                progress.append(explanation)
+            return explanation
+        self.metrics.record_cache('explanation', misses=1)
+
+        if progress is None:
+            with self.metrics.span('explanation'):
+                response = self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=temperature
+                )
+                explanation = response.choices[0].message.content.strip()
+            self.explanation_cache.put(cache_key, explanation)
+            return explanation
+
+        # Com uma resposta em andamento, receber a explicação em stream e publicar cada token
+        parts = []
+        with self.metrics.span('explanation'):
+            stream = self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=500,
+                temperature=temperature,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    parts.append(token)
+                    progress.append(token)
+        explanation = "".join(parts).strip()
+        self.explanation_cache.put(cache_key, explanation)
+        return explanation
+
+    def submit_io(self, function, *args):
+        # Executa a função no executor de E/S preservando o contexto da pergunta (resposta parcial e trace)
+        progress = self.current_progress()
+        trace = getattr(self.metrics.local, 'trace', None)
+
+        def run():
+            self.local.progress = progress
+            self.metrics.local.trace = trace
+            try:
+                return function(*args)
+            finally:
+                self.local.progress = None
+                self.metrics.local.trace = None
+
+        return self.io_executor.submit(run)
+
+    def current_progress(self):
+        # Resposta parcial associada à pergunta processada na thread atual, se houver
+        return getattr(self.local, 'progress', None)
+
+    def publish_main_info(self, main_info):
+        # Exibe a informação principal imediatamente, antes da explicação do GPT
+        progress = self.current_progress()
+        if progress is not None:
+            progress.set_main_info(main_info)
+
+    def after_fork(self):
+        # Reinicia, no processo worker, o que não pode ser herdado do processo mestre pelo fork:
+        # threads dos executores, conexões HTTP abertas e métricas por processo.
+        # Dados, índices e embeddings de referência continuam compartilhados (copy-on-write)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='question')
+        self.io_executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='io')
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.local = threading.local()
+        self.metrics = Metrics(trace_log=self.metrics.trace_log)
+        self.http_client = None
+        self._client = None
+        self.client_lock = threading.Lock()
 
     def run(self):
         # Executa a aplicação Dash
@@ -460,6 +1148,16 @@ class Main:
 
 # Execução da aplicação
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Análise de QoE em streaming de vídeo")
+    parser.add_argument('--batch', metavar='PERGUNTAS.jsonl', help="processa um arquivo JSONL de perguntas em lote")
+    parser.add_argument('--output', metavar='RESPOSTAS.jsonl', default='respostas.jsonl', help="arquivo JSONL de saída do modo em lote")
+    parser.add_argument('--concurrency', type=int, default=8, help="número máximo de chamadas simultâneas ao GPT no modo em lote")
+    args = parser.parse_args()
+
     api_key = '****************************************************'
     app_instance = Main(api_key)
-    app_instance.run()
+    if args.batch:
+        count = app_instance.process_question_file(args.batch, args.output, max_concurrency=args.concurrency)
+        print(f"{count} perguntas processadas. Respostas gravadas em {args.output}.")
+    else:
+        app_instance.run()
@@ -0,0 +1,115 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def format_labels(labels):
+    # Rótulos no formato de texto do Prometheus
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    def __init__(self, trace_log=None):
+        # Histogramas de duração por etapa, contadores de uso da OpenAI e de caches, e trace opcional por pergunta
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.local = threading.local()
+        self.trace_log = trace_log
+
+    def observe(self, stage, seconds, **labels):
+        # Registra uma duração no histograma da etapa
+        key = tuple(sorted({'stage': stage, **labels}.items()))
+        with self.lock:
+            histogram = self.histograms.setdefault(key, {'buckets': [0] * len(LATENCY_BUCKETS), 'sum': 0.0, 'count': 0})
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def increment(self, name, value=1, **labels):
+        # Incrementa um contador
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def record_openai_call(self, endpoint, usage=None):
+        # Conta a chamada à API e os tokens informados na resposta
+        self.increment('qoe_openai_calls_total', endpoint=endpoint)
+        if usage is not None:
+            self.increment('qoe_openai_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, endpoint=endpoint, kind='prompt')
+            self.increment('qoe_openai_tokens_total', getattr(usage, 'completion_tokens', 0) or 0, endpoint=endpoint, kind='completion')
+
+    def record_cache(self, cache, hits=0, misses=0):
+        # Conta acertos e faltas de um cache
+        if hits:
+            self.increment('qoe_cache_requests_total', hits, cache=cache, result='hit')
+        if misses:
+            self.increment('qoe_cache_requests_total', misses, cache=cache, result='miss')
+
+    @contextmanager
+    def span(self, stage, exclusive=True, **labels):
+        # Mede o tempo da etapa e o anexa ao trace atual; por padrão, desconta as etapas aninhadas na mesma thread
+        stack = self.local.__dict__.setdefault('stack', [])
+        frame = {'children': 0.0}
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1]['children'] += elapsed
+            duration = max(elapsed - frame['children'], 0.0) if exclusive else elapsed
+            self.observe(stage, duration, **labels)
+            trace = getattr(self.local, 'trace', None)
+            if trace is not None:
+                trace['spans'].append({'stage': stage, **labels, 'ms': round(duration * 1000, 3)})
+
+    def start_trace(self, question):
+        # Inicia o trace da pergunta processada na thread atual
+        self.local.trace = {'question': question, 'started_at': time.time(), 'spans': []}
+        return self.local.trace
+
+    def finish_trace(self, status):
+        # Finaliza o trace e o grava como uma linha JSON, se o log estiver habilitado
+        trace = getattr(self.local, 'trace', None)
+        self.local.trace = None
+        if trace is None:
+            return None
+        trace['status'] = status
+        trace['total_ms'] = round((time.time() - trace['started_at']) * 1000, 3)
+        if self.trace_log:
+            with self.lock, open(self.trace_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        return trace
+
+    def render(self):
+        # Exposição no formato de texto do Prometheus
+        lines = [
+            "# HELP qoe_stage_duration_seconds Duração de cada etapa do pipeline.",
+            "# TYPE qoe_stage_duration_seconds histogram",
+        ]
+        with self.lock:
+            histograms = {key: dict(value, buckets=list(value['buckets'])) for key, value in self.histograms.items()}
+            counters = dict(self.counters)
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                lines.append(f"qoe_stage_duration_seconds_bucket{format_labels(key + (('le', bound),))} {count}")
+            lines.append(f"qoe_stage_duration_seconds_bucket{format_labels(key + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"qoe_stage_duration_seconds_sum{format_labels(key)} {histogram['sum']}")
+            lines.append(f"qoe_stage_duration_seconds_count{format_labels(key)} {histogram['count']}")
+        for name in sorted({name for name, _ in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
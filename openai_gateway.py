@@ -0,0 +1,309 @@
+import json
+import time
+import random
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+
+def status_code(error):
+    # Código HTTP de um erro do SDK da OpenAI (ou de um cliente compatível), se houver
+    code = getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code
+
+
+def transient(error):
+    # Falha passageira do provedor ou da rede: erro 5xx, tempo esgotado ou conexão perdida
+    code = status_code(error)
+    if code is not None:
+        return code >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in ('APITimeoutError', 'APIConnectionError')
+
+
+def retry_after(error):
+    # Espera sugerida pelo provedor no cabeçalho Retry-After, em segundos
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity, min_rate=1.0):
+        # Balde de fichas adaptativo: a taxa cai pela metade a cada 429 e volta a subir aos poucos com os sucessos
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        # Repõe as fichas acumuladas desde a última atualização
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        # Bloqueia até haver uma ficha disponível
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self):
+        # Redução multiplicativa da taxa após um 429, descartando a rajada acumulada
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def speed_up(self):
+        # Aumento aditivo da taxa após um sucesso, até o limite configurado
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class SharedCallError(Exception):
+    description = "Chamada compartilhada falhou"
+
+    def __init__(self, error):
+        # Erro de uma chamada compartilhada entregue a quem a aguardava; o original fica em cause e __cause__.
+        # Cada um recebe sua própria instância, sem disputar o __traceback__ do erro original entre threads
+        super().__init__(f"{self.description}: {error!r}")
+        self.cause = error
+        self.status_code = status_code(error)
+
+
+class SharedStreamError(SharedCallError):
+    description = "Stream compartilhado falhou"
+
+
+def shared_result(future):
+    # Resultado de uma chamada compartilhada; uma falha chega como um SharedCallError próprio deste chamador
+    error = future.exception()
+    if error is not None:
+        raise SharedCallError(error) from error
+    return future.result()
+
+
+class SharedStream:
+    def __init__(self):
+        # Um único stream da API lido sob demanda e repassado, desde o início, a todos os assinantes
+        self.stream = None
+        self.on_finish = None
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.usage = None
+        self.lock = threading.Lock()
+        self.started = threading.Event()
+
+    def start(self, stream, on_finish=None):
+        # Associa o stream aberto pela chamada e libera os assinantes
+        self.stream = iter(stream)
+        self.on_finish = on_finish
+        self.started.set()
+
+    def fail(self, error):
+        # A chamada que abriria o stream falhou: os assinantes recebem o erro
+        self.error = error
+        self.done = True
+        self.started.set()
+
+    def _chunk(self, index):
+        # Pedaço index do stream, lendo o próximo da API quando ainda não foi recebido
+        self.started.wait()
+        with self.lock:
+            while len(self.chunks) <= index and not self.done:
+                try:
+                    chunk = next(self.stream)
+                except StopIteration:
+                    self.done = True
+                except Exception as e:
+                    self.error = e
+                    self.done = True
+                else:
+                    self.usage = getattr(chunk, 'usage', None) or self.usage
+                    self.chunks.append(chunk)
+                if self.done and self.on_finish is not None:
+                    self.on_finish(self)
+            if index < len(self.chunks):
+                return self.chunks[index]
+            error = self.error
+        if error is not None:
+            raise SharedStreamError(error) from error
+        return None
+
+    def subscribe(self):
+        # Iterador independente sobre os pedaços do stream compartilhado
+        index = 0
+        while True:
+            chunk = self._chunk(index)
+            if chunk is None:
+                return
+            yield chunk
+            index += 1
+
+
+class OpenAIGateway:
+    def __init__(self, client, max_in_flight=32, requests_per_second=50.0, burst=100, max_retries=5,
+                 base_backoff=0.5, max_backoff=20.0, batch_window=0.005, max_batch=256, metrics=None):
+        # Camada sobre o cliente da OpenAI com a mesma interface (embeddings.create, chat.completions.create):
+        # junta pedidos idênticos em andamento, agrupa embeddings simultâneos em uma chamada, limita a
+        # concorrência ao pool de conexões, controla a taxa com um balde de fichas e repete 429, erros 5xx e
+        # falhas de rede com espera aleatória
+        self.client = client
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.metrics = metrics
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.pending_embeddings = {}
+        self.embedding_queue = {}
+        self.flushing = False
+        self.embeddings = SimpleNamespace(create=self.create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_completion))
+
+    def record(self, name, endpoint, value=1):
+        # Incrementa um contador da camada, se houver métricas
+        if self.metrics is not None:
+            self.metrics.increment(name, value, endpoint=endpoint)
+
+    def call(self, endpoint, function, record_usage=True, **kwargs):
+        # Executa a chamada respeitando a taxa e a concorrência; 429 e falhas passageiras são repetidos com espera
+        # exponencial aleatória, mas só o 429 reduz a taxa de envio.
+        # Em stream, o uso só é conhecido no último pedaço e é registrado ao final (record_usage=False)
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                with self.slots:
+                    response = function(**kwargs)
+            except Exception as e:
+                rate_limited = status_code(e) == 429
+                if not (rate_limited or transient(e)) or attempt == self.max_retries:
+                    raise
+                if rate_limited:
+                    self.bucket.slow_down()
+                self.record('qoe_openai_retries_total', endpoint)
+                time.sleep(min(self.max_backoff, retry_after(e) or random.uniform(0, self.base_backoff * 2 ** attempt)))
+                continue
+            self.bucket.speed_up()
+            if self.metrics is not None and record_usage:
+                self.metrics.record_openai_call(endpoint, getattr(response, 'usage', None))
+            return response
+
+    def coalesce(self, key, endpoint, function):
+        # O primeiro pedido com a chave executa a chamada; os idênticos que chegam enquanto ela está em andamento a aguardam
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self.inflight[key] = Future()
+        if not leader:
+            self.record('qoe_openai_coalesced_total', endpoint)
+            return shared_result(future)
+        try:
+            result = function()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def create_completion(self, **kwargs):
+        # Chat completions: pedidos idênticos simultâneos, em stream ou não, compartilham uma única chamada
+        key = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+        if not kwargs.get('stream'):
+            return self.coalesce(key, 'chat', lambda: self.call('chat', self.client.chat.completions.create, **kwargs))
+
+        # Em stream, a chamada continua em andamento depois de aberta: ela sai dos pendentes só ao terminar
+        with self.lock:
+            shared = self.inflight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self.inflight[key] = SharedStream()
+        if not leader:
+            self.record('qoe_openai_coalesced_total', 'chat')
+            return shared.subscribe()
+        try:
+            stream = self.call('chat', self.client.chat.completions.create, record_usage=False, **kwargs)
+        except Exception as e:
+            with self.lock:
+                del self.inflight[key]
+            shared.fail(e)
+            raise
+        shared.start(stream, lambda finished: self.finish_stream(key, finished))
+        return shared.subscribe()
+
+    def finish_stream(self, key, shared):
+        # Retira o stream concluído dos pendentes e registra o uso informado no último pedaço
+        with self.lock:
+            if self.inflight.get(key) is shared:
+                del self.inflight[key]
+        if self.metrics is not None:
+            self.metrics.record_openai_call('chat', shared.usage)
+
+    def create_embeddings(self, input, model):
+        # Embeddings: textos pedidos ao mesmo tempo (dentro de batch_window) viram uma única chamada,
+        # e textos já pendentes aguardam o vetor em andamento em vez de gerar outra chamada
+        texts = [input] if isinstance(input, str) else list(input)
+        futures = []
+        with self.lock:
+            for text in texts:
+                future = self.pending_embeddings.get((model, text))
+                if future is None:
+                    future = self.pending_embeddings[(model, text)] = Future()
+                    self.embedding_queue.setdefault(model, []).append(text)
+                else:
+                    self.record('qoe_openai_coalesced_total', 'embeddings')
+                futures.append(future)
+            leader = not self.flushing and bool(self.embedding_queue)
+            if leader:
+                self.flushing = True
+        if leader:
+            if self.batch_window:
+                time.sleep(self.batch_window)
+            self.flush_embeddings()
+        data = [SimpleNamespace(embedding=shared_result(future), index=i) for i, future in enumerate(futures)]
+        return SimpleNamespace(data=data, model=model, usage=None)
+
+    def flush_embeddings(self):
+        # Envia os textos acumulados, em lotes de até max_batch por chamada
+        with self.lock:
+            queue, self.embedding_queue = self.embedding_queue, {}
+            self.flushing = False
+        for model, texts in queue.items():
+            for start in range(0, len(texts), self.max_batch):
+                batch = texts[start:start + self.max_batch]
+                try:
+                    response = self.call('embeddings', self.client.embeddings.create, input=batch, model=model)
+                    results = [(text, item.embedding, None) for text, item in zip(batch, response.data)]
+                except Exception as e:
+                    results = [(text, None, e) for text in batch]
+                for text, embedding, error in results:
+                    with self.lock:
+                        future = self.pending_embeddings.pop((model, text))
+                    if error is None:
+                        future.set_result(embedding)
+                    else:
+                        future.set_exception(error)
@@ -0,0 +1,124 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=3600, cache_dir=None, max_disk_entries=None, prune_every=64):
+        # Cache de respostas com expiração (TTL), descarte LRU e persistência opcional em disco.
+        # Em disco valem o mesmo TTL e um limite de max_disk_entries arquivos (os mais antigos saem primeiro),
+        # verificados ao abrir o cache e a cada prune_every gravações
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries or max_entries * 8
+        self.prune_every = prune_every
+        self.puts = 0
+        self.memory = OrderedDict()
+
+        # Chaves gravadas em disco por este processo: o diretório pode ser compartilhado com outros workers
+        self.written = set()
+        self.lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.prune()
+
+    def make_key(self, *parts):
+        # Chave determinística a partir de todos os parâmetros que influenciam a resposta
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        # Caminho do arquivo .json correspondente à chave
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key, expires_at, value):
+        # Insere na LRU em memória e descarta as entradas menos usadas acima do limite
+        self.memory[key] = (expires_at, value)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        # Retorna a resposta armazenada ou None se ausente ou expirada
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.memory.move_to_end(key)
+                    return entry[1]
+                del self.memory[key]
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] <= now:
+            self._remove(path)
+            return None
+        with self.lock:
+            self._remember(key, entry['expires_at'], entry['value'])
+        return entry['value']
+
+    def put(self, key, value):
+        # Armazena a resposta em memória e, se configurado, em disco de forma atômica
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, expires_at, value)
+        if self.cache_dir:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            with self.lock:
+                self.written.add(key)
+                self.puts += 1
+                prune = self.puts % self.prune_every == 0
+            if prune:
+                self.prune()
+
+    def _remove(self, path):
+        # Remove um arquivo do cache, ignorando se outro processo já o removeu
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        # Remove do disco as entradas expiradas (a data de modificação é o instante da gravação) e,
+        # acima de max_disk_entries, as gravadas há mais tempo, inclusive as de execuções anteriores
+        cutoff = time.time() - self.ttl
+        files = []
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                try:
+                    mtime = entry.stat().st_mtime
+                except OSError:
+                    continue
+                if mtime <= cutoff:
+                    self._remove(entry.path)
+                elif entry.name.endswith('.json'):
+                    files.append((mtime, entry.path))
+        if len(files) > self.max_disk_entries:
+            files.sort()
+            for _, path in files[:len(files) - self.max_disk_entries]:
+                self._remove(path)
+
+    def clear(self):
+        # Invalida as respostas deste processo (por exemplo, quando os dados mudam): a camada em memória e
+        # apenas os arquivos que ele gravou, sem apagar o que outros workers gravaram no mesmo diretório
+        with self.lock:
+            self.memory.clear()
+            written, self.written = self.written, set()
+        for key in written:
+            self._remove(self._path(key))
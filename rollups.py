@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+from stats_index import as_datetime, plain_keys
+
+# Resoluções da mais fina para a mais grossa
+GRANULARITIES = {'minute': '1min', '5min': '5min', 'hour': '1h', 'day': '1D'}
+CELL_AGGREGATIONS = {'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max', 'sumsq': 'sum'}
+
+
+def with_moments(cells):
+    # Acrescenta média e desvio padrão amostral calculados a partir de contagem, soma e soma dos quadrados
+    cells = cells.copy()
+    cells['mean'] = cells['sum'] / cells['count']
+    variance = (cells['sumsq'] - cells['sum'] ** 2 / cells['count']) / (cells['count'] - 1)
+    cells['std'] = np.sqrt(variance.clip(lower=0)).where(cells['count'] > 1)
+    return cells
+
+
+class RollupPyramid:
+    def __init__(self):
+        # Células (contagem, soma, mínimo, máximo, soma dos quadrados) por
+        # (métrica, dimensão, resolução) -> {entidade: DataFrame indexado pelo início do intervalo}
+        self.cells = {}
+
+        # Respostas mantidas a cada inclusão para leitura em tempo constante:
+        # (métrica, dimensão, resolução) -> {entidade: maior amplitude (máximo - mínimo) de uma célula}
+        self.max_ranges = {}
+        # (métrica, dimensão) -> {entidade: somas e contagens por hora do dia (24 x 2)} e as médias derivadas delas
+        self.hour_of_day = {}
+        self.hour_of_day_means = {}
+
+        # Medição mais recente de cada métrica e de cada (métrica, dimensão, entidade)
+        self.latest = {}
+        self.entity_latest = {}
+
+    def add(self, data, metric):
+        # Incorpora medições: agrega uma vez por minuto e deriva as resoluções mais grossas das células de minuto
+        if data.empty:
+            return
+        timestamps = as_datetime(data['timestamp'])
+        values = data[metric].astype(float)
+        latest = timestamps.max()
+        self.latest[metric] = max(self.latest.get(metric, latest), latest)
+
+        frame = pd.DataFrame({'value': values, 'square': values ** 2, 'bucket': timestamps.dt.floor('1min')})
+        for dimension in ('client', 'server'):
+            frame['entity'] = plain_keys(data[dimension]).to_numpy()
+            for entity, entity_latest in timestamps.groupby(frame['entity'].to_numpy()).max().items():
+                key = (metric, dimension, entity)
+                self.entity_latest[key] = max(self.entity_latest.get(key, entity_latest), entity_latest)
+
+            minute_cells = frame.groupby(['entity', 'bucket']).agg(
+                count=('value', 'count'), sum=('value', 'sum'), min=('value', 'min'), max=('value', 'max'), sumsq=('square', 'sum')
+            )
+            self._add_hours(metric, dimension, minute_cells)
+            for granularity, freq in GRANULARITIES.items():
+                if granularity == 'minute':
+                    cells = minute_cells
+                else:
+                    coarse = minute_cells.reset_index()
+                    coarse['bucket'] = coarse['bucket'].dt.floor(freq)
+                    cells = coarse.groupby(['entity', 'bucket']).agg(CELL_AGGREGATIONS)
+                self._merge(metric, dimension, granularity, cells)
+
+    def _add_hours(self, metric, dimension, minute_cells):
+        # Acumula somas e contagens por hora do dia das entidades afetadas e atualiza suas médias
+        sums = self.hour_of_day.setdefault((metric, dimension), {})
+        means = self.hour_of_day_means.setdefault((metric, dimension), {})
+        entities = minute_cells.index.get_level_values(0)
+        hours = minute_cells.index.get_level_values(1).hour
+        by_hour = minute_cells[['sum', 'count']].groupby([entities, hours]).sum()
+        for entity, entity_hours in by_hour.groupby(level=0):
+            totals = sums.setdefault(entity, np.zeros((24, 2)))
+            totals[entity_hours.index.get_level_values(1)] += entity_hours[['sum', 'count']].to_numpy()
+            means[entity] = {hour: float(totals[hour, 0] / totals[hour, 1]) for hour in range(24) if totals[hour, 1]}
+
+    def _merge(self, metric, dimension, granularity, cells):
+        # Combina as novas células com as existentes apenas para as entidades afetadas; combinar células só
+        # aumenta sua amplitude, então a maior amplitude da entidade é atualizada olhando apenas as células tocadas
+        level = self.cells.setdefault((metric, dimension, granularity), {})
+        ranges = self.max_ranges.setdefault((metric, dimension, granularity), {})
+        for entity, entity_cells in cells.groupby(level=0):
+            entity_cells = entity_cells.droplevel(0)
+            existing = level.get(entity)
+            if existing is not None:
+                touched = entity_cells.index
+                entity_cells = pd.concat([existing, entity_cells]).groupby(level=0).agg(CELL_AGGREGATIONS)
+                updated = entity_cells.loc[touched]
+            else:
+                updated = entity_cells
+            level[entity] = entity_cells.sort_index()
+            touched_range = float((updated['max'] - updated['min']).max())
+            ranges[entity] = max(ranges.get(entity, touched_range), touched_range)
+
+    def max_range(self, metric, dimension, entity, granularity='5min'):
+        # Maior amplitude (máximo - mínimo) dentro de uma célula da resolução, ou None se a entidade não existe
+        return self.max_ranges.get((metric, dimension, granularity), {}).get(entity)
+
+    def hourly_means(self, metric, dimension, entity):
+        # Média da métrica por hora do dia (0-23), combinando todos os dias
+        means = self.hour_of_day_means.get((metric, dimension), {}).get(entity)
+        return None if means is None else dict(means)
+
+    def _slice(self, metric, dimension, entity, start, end, granularity):
+        # Células brutas de uma resolução no intervalo [start, end), por busca binária no índice ordenado
+        cells = self.cells.get((metric, dimension, granularity), {}).get(entity)
+        if cells is None:
+            return None
+        index = cells.index
+        first = 0 if start is None else index.searchsorted(pd.Timestamp(start), side='left')
+        last = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side='left')
+        return cells.iloc[first:last]
+
+    def query(self, metric, dimension, entity, start=None, end=None, granularity='hour'):
+        # Células de uma resolução no intervalo [start, end), com média e desvio padrão
+        cells = self._slice(metric, dimension, entity, start, end, granularity)
+        return None if cells is None else with_moments(cells)
+
+    def summarize(self, metric, dimension, entity, start=None, end=None):
+        # Estatísticas de um intervalo arbitrário combinando poucas células: as mais grossas que cabem
+        # inteiramente no intervalo e as mais finas apenas nas bordas (precisão de um minuto)
+        if (metric, dimension, 'minute') not in self.cells or entity not in self.cells[(metric, dimension, 'minute')]:
+            return None
+        if start is None and end is None:
+            parts = [self._slice(metric, dimension, entity, None, None, 'day')]
+        else:
+            start = pd.Timestamp(start).floor('1min') if start is not None else self.cells[(metric, dimension, 'minute')][entity].index[0]
+            end = pd.Timestamp(end).ceil('1min') if end is not None else self.latest[metric].floor('1min') + pd.Timedelta(minutes=1)
+            parts = self._cover(metric, dimension, entity, start, end, list(GRANULARITIES)[::-1])
+        parts = [part for part in parts if part is not None and len(part)]
+        if not parts:
+            return {'count': 0, 'sum': 0.0, 'min': np.nan, 'max': np.nan, 'mean': np.nan, 'std': np.nan, 'cells': 0}
+
+        cells = pd.concat(parts)
+        count = cells['count'].sum()
+        total = cells['sum'].sum()
+        sumsq = cells['sumsq'].sum()
+        variance = (sumsq - total ** 2 / count) / (count - 1) if count > 1 else np.nan
+        return {
+            'count': int(count),
+            'sum': total,
+            'min': cells['min'].min(),
+            'max': cells['max'].max(),
+            'mean': total / count,
+            'std': float(np.sqrt(max(variance, 0.0))) if count > 1 else np.nan,
+            'cells': len(cells),
+        }
+
+    def _cover(self, metric, dimension, entity, start, end, levels):
+        # Cobre [start, end) com células da resolução mais grossa possível, descendo nas bordas
+        if start >= end:
+            return []
+        granularity, finer = levels[0], levels[1:]
+        if not finer:
+            return [self._slice(metric, dimension, entity, start, end, granularity)]
+        freq = GRANULARITIES[granularity]
+        inner_start = start.ceil(freq)
+        inner_end = end.floor(freq)
+        if inner_start >= inner_end:
+            return self._cover(metric, dimension, entity, start, end, finer)
+        return (
+            self._cover(metric, dimension, entity, start, inner_start, finer)
+            + [self._slice(metric, dimension, entity, inner_start, inner_end, granularity)]
+            + self._cover(metric, dimension, entity, inner_end, end, finer)
+        )
@@ -0,0 +1,79 @@
+import threading
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    def __init__(self, max_entries=2048, radius=0.95):
+        # Respostas finais indexadas pelo embedding da pergunta: uma pergunta a uma similaridade de cosseno
+        # >= radius de outra já respondida, no mesmo escopo (intenção, entidades, versão dos dados), reutiliza a resposta
+        self.max_entries = max_entries
+        self.radius = radius
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # Descarta todas as respostas (por exemplo, quando os dados mudam)
+        with self.lock:
+            self.matrix = None
+            self.scopes = np.full(self.max_entries, -1, dtype=np.int64)
+            self.last_used = np.zeros(self.max_entries, dtype=np.int64)
+            self.answers = [None] * self.max_entries
+            self.scope_ids = {}
+            self.scope_keys = {}
+            self.scope_rows = {}
+            self.next_scope_id = 0
+            self.size = 0
+            self.clock = 0
+
+    def _unit(self, embedding):
+        # Embedding como vetor float32 de norma 1
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, embedding, scope):
+        # Resposta da pergunta mais parecida no mesmo escopo, se estiver dentro do raio; senão None
+        with self.lock:
+            scope_id = self.scope_ids.get(scope)
+            if scope_id is None or self.matrix is None:
+                return None
+            similarities = self.matrix[:self.size] @ self._unit(embedding)
+            similarities[self.scopes[:self.size] != scope_id] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.radius:
+                return None
+            self.clock += 1
+            self.last_used[best] = self.clock
+            return self.answers[best]
+
+    def put(self, embedding, scope, answer):
+        # Armazena a resposta; acima de max_entries substitui a menos usada recentemente
+        vector = self._unit(embedding)
+        with self.lock:
+            if self.matrix is None:
+                self.matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if self.size < self.max_entries:
+                slot = self.size
+                self.size += 1
+            else:
+                slot = int(np.argmin(self.last_used))
+                self._release_scope(int(self.scopes[slot]))
+            scope_id = self.scope_ids.get(scope)
+            if scope_id is None:
+                scope_id = self.scope_ids[scope] = self.next_scope_id
+                self.scope_keys[scope_id] = scope
+                self.next_scope_id += 1
+            self.scope_rows[scope_id] = self.scope_rows.get(scope_id, 0) + 1
+            self.clock += 1
+            self.matrix[slot] = vector
+            self.scopes[slot] = scope_id
+            self.last_used[slot] = self.clock
+            self.answers[slot] = answer
+
+    def _release_scope(self, scope_id):
+        # Desconta a linha substituída do escopo e o esquece quando era a última (versões antigas dos dados)
+        self.scope_rows[scope_id] -= 1
+        if not self.scope_rows[scope_id]:
+            del self.scope_rows[scope_id]
+            del self.scope_ids[self.scope_keys.pop(scope_id)]
@@ -0,0 +1,103 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BUCKET_KEYS = ['client', 'server', 'minute']
+
+
+def minute_keys(timestamps):
+    # Minuto de cada medição como inteiro (segundos // 60), sem converter nem alterar a coluna mapeada em memória
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        timestamps = timestamps.astype('datetime64[s]').astype('int64')
+    return (timestamps // 60).rename('minute')
+
+
+def minute_means(data, column):
+    # Média da métrica por cliente, servidor e minuto
+    keys = [data['client'], data['server'], minute_keys(data['timestamp'])]
+    return data[column].groupby(keys, observed=True).mean().reset_index()
+
+
+def aggregate_minute_means(bitrate_data, latency_data):
+    # Agrupar por cliente, servidor e minuto, calculando a média
+    bitrate_grouped = minute_means(bitrate_data, 'bitrate')
+    latency_grouped = minute_means(latency_data, 'rtt')
+
+    # Mesclar as duas séries com base em cliente, servidor e minuto; só o resultado agregado recebe o minuto como data
+    merged_data = pd.merge(bitrate_grouped, latency_grouped, on=BUCKET_KEYS)
+    merged_data['minute'] = pd.to_datetime(merged_data['minute'] * 60, unit='s')
+    return merged_data
+
+
+def balanced_cuts(weights, n_shards):
+    # Divide uma sequência ordenada de pesos em até n_shards faixas contíguas de peso parecido
+    cumulative = np.cumsum(weights)
+    targets = cumulative[-1] * np.arange(1, n_shards) / n_shards
+    cuts = np.unique(np.searchsorted(cumulative, targets, side='right'))
+    return [0] + [int(cut) for cut in cuts if 0 < cut < len(weights)] + [len(weights)]
+
+
+def shard_by_client(bitrate_data, latency_data, n_shards):
+    # Faixas contíguas de clientes, na ordem em que o agrupamento serial os devolveria
+    counts = bitrate_data['client'].value_counts(sort=False)
+    clients = counts.index[counts.to_numpy() > 0] if isinstance(bitrate_data['client'].dtype, pd.CategoricalDtype) else counts.index.sort_values()
+    cuts = balanced_cuts(counts.reindex(clients).to_numpy(), n_shards)
+    for first, last in zip(cuts[:-1], cuts[1:]):
+        selected = clients[first:last]
+        yield bitrate_data[bitrate_data['client'].isin(selected)], latency_data[latency_data['client'].isin(selected)]
+
+
+def shard_by_time(bitrate_data, latency_data, n_shards):
+    # Faixas contíguas de minutos: cada bucket (cliente, servidor, minuto) cai inteiro em um único shard
+    bitrate_minutes = minute_keys(bitrate_data['timestamp']).to_numpy()
+    latency_minutes = minute_keys(latency_data['timestamp']).to_numpy()
+    minutes = pd.Series(bitrate_minutes).value_counts().sort_index()
+    cuts = balanced_cuts(minutes.to_numpy(), n_shards)
+    bounds = [minutes.index[cut] for cut in cuts[1:-1]]
+    for start, end in zip([None] + bounds, bounds + [None]):
+        bitrate_mask = np.ones(len(bitrate_data), dtype=bool)
+        latency_mask = np.ones(len(latency_data), dtype=bool)
+        if start is not None:
+            bitrate_mask &= bitrate_minutes >= start
+            latency_mask &= latency_minutes >= start
+        if end is not None:
+            bitrate_mask &= bitrate_minutes < end
+            latency_mask &= latency_minutes < end
+        yield bitrate_data[bitrate_mask], latency_data[latency_mask]
+
+
+def serial_order(merged_data, bitrate_data):
+    # Reordena o resultado por (cliente, servidor, minuto) como o agrupamento serial sobre os dados de bitrate
+    keys = [merged_data[column] for column in ('client', 'server')]
+    codes = [
+        pd.Categorical(key, categories=bitrate_data[column].cat.categories).codes
+        if isinstance(bitrate_data[column].dtype, pd.CategoricalDtype) else key
+        for column, key in zip(('client', 'server'), keys)
+    ]
+    order = pd.DataFrame({'client': codes[0], 'server': codes[1], 'minute': merged_data['minute'].to_numpy()})
+    return merged_data.iloc[order.sort_values(BUCKET_KEYS, kind='stable').index].reset_index(drop=True)
+
+
+def aggregate_minute_means_sharded(bitrate_data, latency_data, workers=None, shard_by=None):
+    # Mesmo resultado de aggregate_minute_means, com os shards agregados em um pool de processos.
+    # Cada bucket (cliente, servidor, minuto) pertence a um único shard, então as médias não mudam;
+    # a normalização min-max global e a QoE são aplicadas depois, sobre o resultado combinado
+    workers = workers or os.cpu_count() or 1
+    bitrate_data = bitrate_data[['client', 'server', 'timestamp', 'bitrate']]
+    latency_data = latency_data[['client', 'server', 'timestamp', 'rtt']]
+    if shard_by is None:
+        shard_by = 'client' if bitrate_data['client'].nunique() >= workers else 'time'
+    shards = list((shard_by_client if shard_by == 'client' else shard_by_time)(bitrate_data, latency_data, workers))
+    if len(shards) < 2:
+        return aggregate_minute_means(bitrate_data, latency_data)
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as pool:
+        parts = list(pool.map(aggregate_minute_means, *zip(*shards)))
+    merged_data = pd.concat(parts, ignore_index=True)
+
+    # Shards de clientes já saem na ordem serial; shards de tempo precisam ser intercalados
+    if shard_by == 'client':
+        return merged_data
+    return serial_order(merged_data, bitrate_data)
@@ -0,0 +1,98 @@
+import os
+import json
+import pickle
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from columnar_store import source_signature
+
+SNAPSHOT_VERSION = 3
+
+
+def file_sha256(path):
+    # Hash do conteúdo do arquivo, lido em blocos
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def phrases_sha256(phrases, embedding_model):
+    # Hash das frases de referência e do modelo usado para gerar seus embeddings
+    return hashlib.sha256(json.dumps([embedding_model, phrases], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def environment_key():
+    # Versões que afetam o formato do estado serializado
+    return {'snapshot': SNAPSHOT_VERSION, 'pandas': pd.__version__, 'numpy': np.__version__}
+
+
+def source_hashes(csv_paths, known=None):
+    # Hash de cada CSV de origem; reaproveita o hash registrado quando tamanho e data de modificação não mudaram
+    known = {entry['signature']['path']: entry for entry in (known or [])}
+    sources = []
+    for path in csv_paths:
+        signature = source_signature(path)
+        entry = known.get(signature['path'])
+        sha256 = entry['sha256'] if entry is not None and entry['signature'] == signature else file_sha256(path)
+        sources.append({'signature': signature, 'sha256': sha256})
+    return sources
+
+
+def read_meta(snapshot_dir):
+    # Lê os metadados do snapshot, se existirem
+    try:
+        with open(os.path.join(snapshot_dir, 'meta.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_snapshot(snapshot_dir, csv_paths, phrases, embedding_model):
+    # Restaura o estado inicializado se o snapshot corresponde às versões, aos CSVs e às frases atuais; senão None
+    meta = read_meta(snapshot_dir)
+    if meta is None or meta.get('environment') != environment_key() or meta.get('phrases') != phrases_sha256(phrases, embedding_model):
+        return None
+    sources = source_hashes(csv_paths, meta['sources'])
+    if [source['sha256'] for source in sources] != [source['sha256'] for source in meta['sources']]:
+        return None
+    try:
+        with open(os.path.join(snapshot_dir, 'state.pkl'), 'rb') as f:
+            state = pickle.load(f)
+        state['reference_matrix'] = np.load(os.path.join(snapshot_dir, 'reference_matrix.npy'))
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        return None
+
+    # CSVs apenas "tocados" (mesmo conteúdo, nova data de modificação): atualizar as assinaturas registradas
+    if sources != meta['sources']:
+        write_meta(snapshot_dir, dict(meta, sources=sources))
+    return state
+
+
+def write_meta(snapshot_dir, meta):
+    # Grava os metadados de forma atômica
+    tmp_path = os.path.join(snapshot_dir, f'meta.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(snapshot_dir, 'meta.json'))
+
+
+def save_snapshot(snapshot_dir, csv_paths, phrases, embedding_model, state):
+    # Grava o estado inicializado; os metadados vêm por último, marcando o snapshot como completo
+    os.makedirs(snapshot_dir, exist_ok=True)
+    try:
+        os.remove(os.path.join(snapshot_dir, 'meta.json'))
+    except OSError:
+        pass
+    state = dict(state)
+    np.save(os.path.join(snapshot_dir, 'reference_matrix.npy'), state.pop('reference_matrix'))
+    with open(os.path.join(snapshot_dir, 'state.pkl'), 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    write_meta(snapshot_dir, {
+        'environment': environment_key(),
+        'phrases': phrases_sha256(phrases, embedding_model),
+        'sources': source_hashes(csv_paths),
+    })
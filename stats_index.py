@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+
+STAT_COLUMNS = ['count', 'sum', 'min', 'max', 'm2']
+
+
+def as_datetime(timestamps):
+    # Aceita timestamps em segundos (inteiros) ou já convertidos para datetime
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps
+    return pd.to_datetime(timestamps, unit='s')
+
+
+def plain_keys(keys):
+    # Converte chaves categóricas em texto para que resumos de lotes diferentes possam ser combinados
+    if isinstance(keys.dtype, pd.CategoricalDtype):
+        return keys.astype(str)
+    return keys
+
+
+def summarize(values, keys):
+    # Resume os valores por chave: contagem, soma, mínimo, máximo e soma dos quadrados dos desvios (M2)
+    grouped = values.astype(float).groupby(plain_keys(keys))
+    summary = grouped.agg(['count', 'sum', 'min', 'max', 'var'])
+    summary['m2'] = summary['var'].fillna(0.0) * (summary['count'] - 1)
+    return summary[STAT_COLUMNS].astype(float)
+
+
+def merge_summaries(left, right):
+    # Combina dois resumos com a fórmula paralela de Chan para a variância
+    if left is None or left.empty:
+        return right
+    index = left.index.union(right.index)
+    a = left.reindex(index)
+    b = right.reindex(index)
+    count_a = a['count'].fillna(0.0)
+    count_b = b['count'].fillna(0.0)
+    count = count_a + count_b
+    sum_a = a['sum'].fillna(0.0)
+    sum_b = b['sum'].fillna(0.0)
+    mean_a = (sum_a / count_a).fillna(0.0)
+    mean_b = (sum_b / count_b).fillna(0.0)
+    delta = mean_b - mean_a
+    merged = pd.DataFrame(index=index)
+    merged['count'] = count
+    merged['sum'] = sum_a + sum_b
+    merged['min'] = np.fmin(a['min'], b['min'])
+    merged['max'] = np.fmax(a['max'], b['max'])
+    merged['m2'] = a['m2'].fillna(0.0) + b['m2'].fillna(0.0) + delta ** 2 * count_a * count_b / count
+    return merged
+
+
+def qoe_sums(qoe, keys):
+    # Soma e soma dos quadrados da QoE finita, contagem e número de valores infinitos por chave (NaN é ignorado)
+    qoe = pd.Series(np.asarray(qoe, dtype=float), index=pd.Index(plain_keys(pd.Series(keys)).to_numpy()))
+    finite = qoe.where(np.isfinite(qoe))
+    return pd.DataFrame({
+        'sum': finite.groupby(level=0).sum(),
+        'sumsq': (finite ** 2).groupby(level=0).sum(),
+        'count': finite.groupby(level=0).count().astype(float),
+        'inf': np.isinf(qoe).groupby(level=0).sum().astype(float),
+    })
+
+
+def qoe_moments(sums):
+    # Média e variância amostral a partir das somas; com algum valor infinito, média infinita e variância NaN
+    count = sums['count'] + sums['inf']
+    mean = (sums['sum'] / count).where(sums['inf'] == 0, np.inf)
+    variance = ((sums['sumsq'] - sums['sum'] ** 2 / sums['count']) / (sums['count'] - 1)).clip(lower=0)
+    return mean.where(count > 0), variance.where((sums['inf'] == 0) & (sums['count'] > 1))
+
+
+class StatsIndex:
+    def __init__(self):
+        # Resumos por (fonte, dimensão) -> {entidade: estatísticas}
+        self.summaries = {}
+        self.stats = {}
+
+        # Conjuntos de entidades normalizados em minúsculas: (fonte, dimensão) -> {minúsculo: original}
+        self.entities = {}
+
+        # Agregados de QoE calculados sobre os dados pré-processados
+        self.client_qoe_mean = pd.Series(dtype=float)
+        self.server_qoe_var = pd.Series(dtype=float)
+        self.client_frames = {}
+
+        # Somas da QoE por cliente e por servidor (finitas, dos quadrados, contagem e infinitas), para que
+        # uma inclusão atualize a média e a variância apenas das entidades afetadas
+        self.qoe_sums = {}
+
+    def _add_summary(self, source, dimension, values, keys):
+        # Atualiza o resumo de uma fonte/dimensão e recalcula apenas as entidades afetadas
+        batch = summarize(values, keys)
+        merged = merge_summaries(self.summaries.get((source, dimension)), batch)
+        self.summaries[(source, dimension)] = merged
+        stats = self.stats.setdefault((source, dimension), {})
+        for entity, row in merged.loc[batch.index].iterrows():
+            count = row['count']
+            stats[entity] = {
+                'count': int(count),
+                'sum': row['sum'],
+                'min': row['min'],
+                'max': row['max'],
+                'mean': row['sum'] / count,
+                'var': row['m2'] / (count - 1) if count > 1 else float('nan'),
+            }
+        lookup = self.entities.setdefault((source, dimension), {})
+        for entity in batch.index:
+            lookup[str(entity).lower()] = entity
+
+    def add_bitrate(self, bitrate_data):
+        # Incorpora novas medições de bitrate ao índice
+        if bitrate_data.empty:
+            return
+        for dimension in ('client', 'server'):
+            self._add_summary('bitrate', dimension, bitrate_data['bitrate'], bitrate_data[dimension])
+
+    def add_latency(self, latency_data):
+        # Incorpora novas medições de RTT ao índice
+        if latency_data.empty:
+            return
+        for dimension in ('client', 'server'):
+            self._add_summary('rtt', dimension, latency_data['rtt'], latency_data[dimension])
+
+    def set_qoe(self, preprocessed_data):
+        # Recalcula os agregados de QoE a partir dos dados pré-processados
+        self.client_qoe_mean = preprocessed_data.groupby('client', observed=True)['QoE'].mean()
+        self.server_qoe_var = preprocessed_data.groupby('server', observed=True)['QoE'].var()
+        self.client_frames = {client: frame for client, frame in preprocessed_data.groupby('client', observed=True)}
+        self.entities[('qoe', 'client')] = {str(client).lower(): client for client in self.client_frames}
+        for dimension in ('client', 'server'):
+            self.qoe_sums[dimension] = qoe_sums(preprocessed_data['QoE'], preprocessed_data[dimension])
+
+    def update_qoe(self, before, after):
+        # Atualiza os agregados de QoE só para as entidades dos buckets alterados por uma inclusão que não
+        # mudou os limites de normalização; before/after são esses buckets indexados por (cliente, servidor, minuto)
+        # antes (NaN nos novos) e depois da inclusão
+        for level, dimension in enumerate(('client', 'server')):
+            delta = qoe_sums(after['QoE'], after.index.get_level_values(level))
+            removed = qoe_sums(before['QoE'], before.index.get_level_values(level))
+            sums = self.qoe_sums[dimension].add(delta, fill_value=0.0).sub(removed, fill_value=0.0)
+            self.qoe_sums[dimension] = sums
+            means, variances = qoe_moments(sums.loc[delta.index])
+            if dimension == 'client':
+                self.client_qoe_mean = means.combine_first(self.client_qoe_mean).rename('QoE').rename_axis(dimension)
+            else:
+                self.server_qoe_var = variances.combine_first(self.server_qoe_var).rename('QoE').rename_axis(dimension)
+
+        # Quadros por cliente: substitui os buckets alterados e acrescenta os novos
+        rows = after.reset_index()
+        rows.columns = ['client', 'server', 'minute'] + list(rows.columns[3:])
+        for client, client_rows in rows.groupby('client'):
+            existing = self.client_frames.get(client)
+            if existing is not None:
+                client_rows = pd.concat([existing, client_rows[existing.columns]], ignore_index=True)
+                client_rows = client_rows.drop_duplicates(['server', 'minute'], keep='last')
+            self.client_frames[client] = client_rows
+            self.entities.setdefault(('qoe', 'client'), {})[str(client).lower()] = client
+
+    def resolve(self, source, dimension, name):
+        # Retorna o identificador original da entidade (sem diferenciar maiúsculas) ou None
+        if name is None:
+            return None
+        return self.entities.get((source, dimension), {}).get(str(name).lower())
+
+    def entity_names(self, dimension):
+        # Todos os identificadores conhecidos (em minúsculas) de uma dimensão
+        names = set()
+        for (source, entity_dimension), lookup in self.entities.items():
+            if entity_dimension == dimension:
+                names.update(lookup)
+        return names
+
+    def get(self, source, dimension, entity):
+        # Estatísticas pré-calculadas de uma entidade
+        return self.stats[(source, dimension)][entity]
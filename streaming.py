@@ -0,0 +1,33 @@
+import threading
+
+
+class AnswerProgress:
+    def __init__(self, on_change=None):
+        # Resposta parcial de uma pergunta: a informação principal e os tokens da explicação recebidos até agora;
+        # on_change, se informado, recebe o texto parcial a cada atualização
+        self.lock = threading.Lock()
+        self.main_info = ""
+        self.explanation_parts = []
+        self.on_change = on_change
+
+    def set_main_info(self, main_info):
+        # Publica a frase determinística calculada a partir dos dados
+        with self.lock:
+            self.main_info = main_info
+        self.notify()
+
+    def append(self, token):
+        # Acrescenta um token da explicação recebido do stream
+        with self.lock:
+            self.explanation_parts.append(token)
+        self.notify()
+
+    def notify(self):
+        # Repassa o texto parcial ao observador, se houver
+        if self.on_change is not None:
+            self.on_change(self.text())
+
+    def text(self):
+        # Texto parcial exibido enquanto a resposta é gerada
+        with self.lock:
+            return f"{self.main_info} {''.join(self.explanation_parts).strip()}".strip()
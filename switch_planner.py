@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+def build_qoe_cube(preprocessed_data):
+    # Monta a matriz densa (cliente × minuto × servidor) de QoE; NaN onde não há medição
+    clients = pd.Index(pd.unique(preprocessed_data['client'].astype(str))).sort_values()
+    minutes = pd.Index(pd.unique(preprocessed_data['minute'])).sort_values()
+    servers = pd.Index(pd.unique(preprocessed_data['server'].astype(str))).sort_values()
+
+    cube = np.full((len(clients), len(minutes), len(servers)), np.nan, dtype=np.float32)
+    cube[
+        clients.get_indexer(preprocessed_data['client'].astype(str)),
+        minutes.get_indexer(preprocessed_data['minute']),
+        servers.get_indexer(preprocessed_data['server'].astype(str))
+    ] = preprocessed_data['QoE'].to_numpy(dtype=np.float32)
+
+    # QoE infinita (latência normalizada igual a zero) é limitada ao maior valor finito
+    finite = np.isfinite(cube)
+    if finite.any():
+        cube[np.isposinf(cube)] = cube[finite].max()
+    return clients, minutes, servers, cube
+
+
+def plan_switches(cube, switch_penalty=0.0):
+    # Programação dinâmica (Viterbi) para todos os clientes ao mesmo tempo: maximiza a soma da QoE
+    # descontando switch_penalty a cada troca de servidor
+    n_clients, n_minutes, n_servers = cube.shape
+    available = np.isfinite(cube)
+    has_data = available.any(axis=2)
+
+    # Minutos sem medição não rendem QoE nem forçam trocas; servidores sem medição não podem ser escolhidos
+    reward = np.where(available, cube, -np.inf)
+    reward[~has_data] = 0.0
+
+    backpointers = np.zeros((n_clients, n_minutes, n_servers), dtype=np.int16)
+    servers = np.arange(n_servers)
+    score = reward[:, 0, :].astype(np.float64)
+    for t in range(1, n_minutes):
+        best_previous = score.argmax(axis=1)
+        switch_score = score[np.arange(n_clients), best_previous][:, None] - switch_penalty
+        stay = score >= switch_score
+        backpointers[:, t, :] = np.where(stay, servers, best_previous[:, None])
+        score = np.where(stay, score, switch_score) + reward[:, t, :]
+
+    # Reconstrução do caminho ótimo de trás para frente
+    path = np.zeros((n_clients, n_minutes), dtype=np.int64)
+    path[:, -1] = score.argmax(axis=1)
+    for t in range(n_minutes - 1, 0, -1):
+        path[:, t - 1] = backpointers[np.arange(n_clients), t, path[:, t]]
+    return np.where(has_data, path, -1), score.max(axis=1)
+
+
+def plan_fleet(preprocessed_data, switch_penalty=0.0):
+    # Plano de troca de servidor para toda a frota e o ganho esperado de QoE por cliente
+    clients, minutes, servers, cube = build_qoe_cube(preprocessed_data)
+    path, _ = plan_switches(cube, switch_penalty)
+
+    client_index, minute_index = np.nonzero(path >= 0)
+    server_index = path[client_index, minute_index]
+    plan = pd.DataFrame({
+        'client': clients[client_index],
+        'minute': minutes[minute_index],
+        'server': servers[server_index],
+        'QoE': cube[client_index, minute_index, server_index],
+    })
+
+    # Trocas contadas apenas entre minutos consecutivos com dados do mesmo cliente
+    changed = (plan['client'] == plan['client'].shift()) & (plan['server'] != plan['server'].shift())
+
+    # Referência: a QoE média observada de cada cliente em todas as suas medições
+    baseline = pd.Series(np.nanmean(cube, axis=(1, 2)), index=clients)
+    summary = plan.assign(switch=changed).groupby('client').agg(
+        minutes=('minute', 'size'),
+        switches=('switch', 'sum'),
+        plan_qoe=('QoE', 'mean')
+    )
+    summary['baseline_qoe'] = baseline.reindex(summary.index)
+    summary['expected_gain'] = summary['plan_qoe'] - summary['baseline_qoe']
+    summary['net_gain'] = summary['expected_gain'] - switch_penalty * summary['switches'] / summary['minutes']
+    return plan, summary
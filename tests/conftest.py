@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from columnar_store import load_measurements
+
+
+@pytest.fixture(scope='session')
+def measurements(tmp_path_factory):
+    # Medições de treino abertas do armazenamento colunar, como em Main
+    store_root = tmp_path_factory.mktemp('columnar')
+    bitrate_data = load_measurements(os.path.join(ROOT, 'data', 'bitrate_train.csv'), str(store_root / 'bitrate_train'), 'bitrate')
+    latency_data = load_measurements(os.path.join(ROOT, 'data', 'rtt_train.csv'), str(store_root / 'rtt_train'), 'rtt')
+    return bitrate_data, latency_data
+
+
+@pytest.fixture
+def app(tmp_path):
+    # Aplicação com o substituto local da OpenAI e caches em um diretório temporário
+    from fake_openai import FakeOpenAI
+    from main import Main
+    return Main('x', client=FakeOpenAI(latency=0), cache_dir=str(tmp_path))
@@ -0,0 +1,22 @@
+import os
+import shutil
+
+from conftest import ROOT
+from columnar_store import load_measurements
+
+
+def test_reingest_leaves_mapped_version_intact(tmp_path):
+    # Um CSV alterado gera uma nova versão das colunas; um quadro já aberto continua lendo a anterior
+    csv_path = tmp_path / 'rtt.csv'
+    shutil.copy(os.path.join(ROOT, 'data', 'rtt_train.csv'), csv_path)
+    store_dir = str(tmp_path / 'store')
+    before = load_measurements(str(csv_path), store_dir, 'rtt')
+    expected = before.copy()
+
+    with open(csv_path, 'a') as f:
+        f.write('zz,ce,1717718941,1.0\n')
+    after = load_measurements(str(csv_path), store_dir, 'rtt')
+
+    assert before.equals(expected)
+    assert len(after) == len(before) + 1 and after['client'].iloc[-1] == 'zz'
+    assert len([name for name in os.listdir(store_dir) if name.startswith('columns.')]) == 1
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from incremental import CsvTailer, QoEAggregator
+from sharded_preprocess import aggregate_minute_means
+from stats_index import StatsIndex
+
+
+def full_reprocess(bitrate_data, latency_data):
+    # Pré-análise completa, como em Main.preprocess_data, indexada por (cliente, servidor, minuto)
+    merged = aggregate_minute_means(bitrate_data, latency_data)
+    for column, normalized_column in (('bitrate', 'Normalized_Bitrate'), ('rtt', 'Normalized_Latency')):
+        merged[normalized_column] = (merged[column] - merged[column].min()) / (merged[column].max() - merged[column].min())
+    merged['QoE'] = merged['Normalized_Bitrate'] / merged['Normalized_Latency']
+    merged['client'] = merged['client'].astype(str)
+    merged['server'] = merged['server'].astype(str)
+    return merged.set_index(['client', 'server', 'minute']).sort_index()
+
+
+def test_batches_match_full_reprocess(measurements):
+    # Incluir as medições em lotes embaralhados dá o mesmo quadro que a pré-análise completa
+    bitrate_data, latency_data = measurements
+    rng = np.random.default_rng(0)
+    bitrate_order = rng.permutation(len(bitrate_data))
+    latency_order = rng.permutation(len(latency_data))
+    aggregator = QoEAggregator()
+    for part in range(8):
+        aggregator.append(
+            bitrate_data=bitrate_data.iloc[np.sort(bitrate_order[part::8])],
+            latency_data=latency_data.iloc[np.sort(latency_order[part::8])]
+        )
+
+    incremental = aggregator.to_frame().set_index(['client', 'server', 'minute'])
+    expected = full_reprocess(bitrate_data, latency_data)
+    assert incremental.index.equals(expected.index)
+    # A pré-análise completa mantém o float32 do armazenamento colunar; a incremental acumula em float64
+    pd.testing.assert_frame_equal(incremental[expected.columns], expected, check_dtype=False, rtol=1e-6)
+
+
+def test_tailer_delivers_complete_rows_and_retries(tmp_path):
+    # Linhas incompletas esperam a próxima leitura e uma falha na incorporação não perde linhas
+    path = tmp_path / 'rtt.csv'
+    path.write_text('client,server,timestamp,rtt\n')
+    received = []
+    failures = [RuntimeError("falha")]
+
+    def on_rows(rows):
+        if failures:
+            raise failures.pop()
+        received.append(rows)
+
+    tailer = CsvTailer(str(path), on_rows)
+    with open(path, 'a') as f:
+        f.write('ba,ce,1717718941,12.5\nba,ce,17177')
+    try:
+        tailer.poll()
+    except RuntimeError:
+        pass
+    assert received == []
+
+    tailer.poll()
+    with open(path, 'a') as f:
+        f.write('18942,13.0\n')
+    tailer.poll()
+    assert [rows['timestamp'].tolist() for rows in received] == [[1717718941], [1717718942]]
+    assert tailer.poll() is None
+
+
+def shifted_sample(data, rows, seconds, rng):
+    # Amostra das medições deslocada no tempo, como texto, no formato entregue pelo CsvTailer
+    sample = data.iloc[np.sort(rng.choice(len(data), rows, replace=False))]
+    return pd.DataFrame({
+        'client': sample['client'].astype(str),
+        'server': sample['server'].astype(str),
+        'timestamp': sample['timestamp'] + seconds,
+        sample.columns[-1]: sample[sample.columns[-1]],
+    })
+
+
+def test_appended_batches_update_qoe_aggregates(app):
+    # Inclusões que mantêm ou movem os limites de normalização deixam os agregados de QoE iguais aos
+    # recalculados do zero sobre o quadro completo
+    rng = np.random.default_rng(1)
+    renormalized = []
+    for batch in range(6):
+        app.append_measurements(
+            bitrate_data=shifted_sample(app.bitrate_data, 2000, 86400 * (batch % 2), rng),
+            latency_data=shifted_sample(app.latency_data, 300, 86400 * (batch % 2), rng)
+        )
+        renormalized.append(app.qoe_aggregator.renormalized)
+    assert set(renormalized) == {True, False}
+
+    expected = StatsIndex()
+    expected.set_qoe(app.preprocessed_data)
+    pd.testing.assert_series_equal(app.stats_index.client_qoe_mean, expected.client_qoe_mean, check_index_type=False, rtol=1e-9)
+    pd.testing.assert_series_equal(app.stats_index.server_qoe_var, expected.server_qoe_var, check_index_type=False, rtol=1e-6)
+    for client, frame in expected.client_frames.items():
+        columns = ['server', 'minute', 'bitrate', 'rtt', 'QoE']
+        actual = app.stats_index.client_frames[client][columns].astype({'server': str}).sort_values(['server', 'minute'], ignore_index=True)
+        pd.testing.assert_frame_equal(actual, frame[columns].astype({'server': str}).sort_values(['server', 'minute'], ignore_index=True), check_dtype=False)
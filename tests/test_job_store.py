@@ -0,0 +1,25 @@
+import time
+
+from job_store import SharedJobStore
+
+
+def test_progress_within_interval_is_delayed_not_dropped(tmp_path):
+    # Uma atualização logo após a anterior é gravada ao fim do intervalo, com o texto mais recente
+    store = SharedJobStore(str(tmp_path), flush_interval=0.1)
+    store.publish_progress('job', "", force=True)
+    store.publish_progress('job', "informação principal")
+    store.publish_progress('job', "informação principal e explicação")
+    assert store.read('job') == {'done': False, 'text': ""}
+    time.sleep(0.3)
+    assert store.read('job') == {'done': False, 'text': "informação principal e explicação"}
+
+
+def test_result_is_not_overwritten_by_pending_progress(tmp_path):
+    # O andamento pendente é descartado quando o resultado final é publicado
+    store = SharedJobStore(str(tmp_path), flush_interval=0.1)
+    store.publish_progress('job', "", force=True)
+    store.publish_progress('job', "parcial")
+    store.publish_result('job', ("resposta", "Pergunta processada com sucesso."))
+    time.sleep(0.3)
+    assert store.read('job') == {'done': True, 'result': ["resposta", "Pergunta processada com sucesso."]}
+    assert store.timers == {} and store.pending == {}
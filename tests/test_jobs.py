@@ -0,0 +1,55 @@
+import time
+
+import dash
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+
+QUESTION = "Qual a latência média do cliente ba?"
+
+
+def trigger(app, component, n_clicks, n_intervals, question, job_id):
+    # Executa o callback da página como se disparado pelo componente dado
+    key = next(key for key in app.app.callback_map if 'output-response' in key)
+    context_value.set(AttributeDict(triggered_inputs=[{'prop_id': f'{component}.n_intervals', 'value': n_intervals}]))
+    return app.app.callback_map[key]['callback'].__wrapped__(n_clicks, n_intervals, question, job_id)
+
+
+def wait(app, job_id):
+    # Aguarda a conclusão do trabalho
+    while app.poll_question(job_id) is None:
+        time.sleep(0.01)
+    return app.poll_question(job_id)
+
+
+def test_poll_without_job_changes_nothing(app):
+    # Um intervalo sem trabalho em andamento não reenvia a pergunta já respondida
+    assert trigger(app, 'poll-interval', 1, 5, QUESTION, None) == (dash.no_update,) * 4
+    assert app.jobs == {}
+
+
+def test_overlapping_polls_get_the_same_answer(app):
+    # Consultas repetidas ao mesmo trabalho concluído recebem a resposta até job_result_ttl
+    job_id = trigger(app, 'submit-button', 1, 0, QUESTION, None)[2]
+    answer = wait(app, job_id)
+    assert trigger(app, 'poll-interval', 1, 1, QUESTION, job_id) == answer + (None, True)
+    assert trigger(app, 'poll-interval', 1, 2, QUESTION, job_id) == answer + (None, True)
+
+    app.job_result_ttl = 0
+    app.evict_jobs()
+    assert app.jobs == {}
+    assert app.poll_question(job_id)[0] == "Erro: pergunta não encontrada."
+
+
+def test_shared_results_are_kept_until_evicted(app, tmp_path):
+    # Com vários workers, o resultado publicado é lido por qualquer um e só some após job_result_ttl
+    from job_store import SharedJobStore
+    app.shared_jobs = SharedJobStore(str(tmp_path / 'jobs'))
+    job_id = app.submit_question(QUESTION)
+    answer = wait(app, job_id)
+    assert job_id not in app.jobs
+    assert app.poll_question(job_id) == answer
+
+    app.shared_jobs.evict(60)
+    assert app.poll_question(job_id) == answer
+    app.shared_jobs.evict(0)
+    assert app.poll_question(job_id)[0] == "Erro: pergunta não encontrada."
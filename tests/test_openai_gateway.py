@@ -0,0 +1,149 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fake_openai import FakeOpenAI
+from openai_gateway import OpenAIGateway, SharedCallError, SharedStreamError
+
+MESSAGES = [{"role": "user", "content": "Explique a QoE do cliente ba."}]
+
+
+def gateway(client, **options):
+    # Camada com esperas curtas, para que os testes não dependam do tempo de espera real
+    options.setdefault('base_backoff', 0.001)
+    return OpenAIGateway(client, **options)
+
+
+def test_retries_rate_limits():
+    # Com um 429 a cada duas chamadas, todas as respostas chegam e a taxa de envio é reduzida
+    client = FakeOpenAI(latency=0, rate_limit_every=2)
+    api = gateway(client)
+    for _ in range(3):
+        assert api.chat.completions.create(model='gpt', messages=MESSAGES).choices[0].message.content == client.explanation
+    assert client.calls['chat'] == 5
+    assert api.bucket.rate < api.bucket.max_rate
+
+
+def test_gives_up_after_max_retries():
+    # Um 429 persistente é repassado depois de max_retries novas tentativas
+    client = FakeOpenAI(latency=0, rate_limit_every=1)
+    with pytest.raises(Exception) as error:
+        gateway(client, max_retries=2).chat.completions.create(model='gpt', messages=MESSAGES)
+    assert error.value.status_code == 429
+    assert client.calls['chat'] == 3
+
+
+class FlakyClient(FakeOpenAI):
+    def __init__(self, errors):
+        # Cliente que falha com os erros dados antes de responder
+        super().__init__(latency=0)
+        self.errors = list(errors)
+
+    def create_completion(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super().create_completion(**kwargs)
+
+
+class ServerError(Exception):
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.response = type('Response', (), {'headers': headers or {}})()
+
+
+def test_retries_transient_errors_without_slowing_down():
+    # Erros 5xx, tempo esgotado e conexão perdida são repetidos sem reduzir a taxa; um 400 não
+    api = gateway(FlakyClient([ServerError(503), TimeoutError(), ConnectionResetError()]))
+    assert api.chat.completions.create(model='gpt', messages=MESSAGES).choices
+    assert api.bucket.rate == api.bucket.max_rate
+
+    client = FlakyClient([ServerError(400)])
+    with pytest.raises(ServerError):
+        gateway(client).chat.completions.create(model='gpt', messages=MESSAGES)
+    assert client.calls['chat'] == 0
+
+
+def test_clamps_retry_after():
+    # Um Retry-After longo não prende a thread além de max_backoff
+    api = gateway(FlakyClient([ServerError(429, {'retry-after': '3600'})]), max_backoff=0.05)
+    started = time.monotonic()
+    assert api.chat.completions.create(model='gpt', messages=MESSAGES).choices
+    assert time.monotonic() - started < 1
+
+
+def test_coalesced_failure_reaches_every_waiter():
+    # Quem aguardava uma chamada que falhou recebe um erro próprio, encadeado ao original
+    class SlowFailure(FakeOpenAI):
+        def create_completion(self, **kwargs):
+            time.sleep(0.2)
+            raise ServerError(400)
+
+        def create_embeddings(self, input, model):
+            time.sleep(0.1)
+            raise ServerError(400)
+
+    api = gateway(SlowFailure(latency=0))
+
+    def capture(create):
+        try:
+            create()
+        except Exception as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        errors = list(pool.map(lambda _: capture(lambda: api.chat.completions.create(model='gpt', messages=MESSAGES)), range(4)))
+        errors += list(pool.map(lambda i: capture(lambda: api.embeddings.create(input=f"texto {i}", model='ada')), range(4)))
+    assert len({id(error) for error in errors}) == 8
+    assert sum(isinstance(error, SharedCallError) for error in errors[:4]) == 3
+    assert all(isinstance(error, SharedCallError) and error.status_code == 400 for error in errors[4:])
+    assert all(isinstance(getattr(error, 'cause', error), ServerError) for error in errors)
+
+
+def test_coalesces_identical_requests():
+    # Pedidos idênticos simultâneos compartilham uma chamada; embeddings simultâneos viram um lote
+    client = FakeOpenAI(latency=0.2)
+    api = gateway(client, batch_window=0.2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        completions = list(pool.map(lambda _: api.chat.completions.create(model='gpt', messages=MESSAGES), range(8)))
+        embeddings = list(pool.map(lambda i: api.embeddings.create(input=f"pergunta {i % 4}", model='ada'), range(8)))
+    assert client.calls == {'chat': 1, 'embeddings': 1}
+    assert len({id(completion) for completion in completions}) == 1
+    assert embeddings[0].data[0].embedding == embeddings[4].data[0].embedding == client.embed("pergunta 0")
+    assert api.inflight == {} and api.pending_embeddings == {}
+
+
+def test_shares_streams():
+    # Assinantes de um stream idêntico em andamento recebem todos os pedaços desde o início
+    client = FakeOpenAI(latency=0.2)
+    api = gateway(client)
+
+    def read(_):
+        stream = api.chat.completions.create(model='gpt', messages=MESSAGES, stream=True)
+        return ''.join(chunk.choices[0].delta.content for chunk in stream if chunk.choices)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        texts = list(pool.map(read, range(4)))
+    assert texts == [client.explanation] * 4
+    assert client.calls['chat'] == 1 and api.inflight == {}
+
+
+def test_stream_failure_reaches_every_subscriber():
+    # Uma falha no meio do stream chega a cada assinante como um erro próprio, encadeado ao original
+    class BrokenStream(FakeOpenAI):
+        def stream_completion(self, prompt_tokens):
+            yield from list(super().stream_completion(prompt_tokens))[:2]
+            raise ConnectionResetError("stream interrompido")
+
+    api = gateway(BrokenStream(latency=0.1))
+
+    def read(_):
+        try:
+            list(api.chat.completions.create(model='gpt', messages=MESSAGES, stream=True))
+        except SharedStreamError as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        errors = list(pool.map(read, range(3)))
+    assert len({id(error) for error in errors}) == 3
+    assert all(isinstance(error.__cause__, ConnectionResetError) for error in errors)
@@ -0,0 +1,35 @@
+import os
+import time
+
+from response_cache import ResponseCache
+
+
+def disk_entries(cache_dir):
+    # Arquivos de resposta presentes no diretório do cache
+    return sorted(name for _, _, names in os.walk(cache_dir) for name in names if name.endswith('.json'))
+
+
+def test_expired_entries_are_removed_from_disk(tmp_path):
+    # Uma entrada expirada lida do disco é apagada, e as de execuções anteriores somem ao abrir o cache
+    cache = ResponseCache(ttl=0.1, cache_dir=str(tmp_path))
+    key = cache.make_key('prompt', 'v1')
+    cache.put(key, 'explicação')
+    time.sleep(0.2)
+    assert cache.get(key) is None
+    assert disk_entries(tmp_path) == []
+
+    cache.put(key, 'explicação')
+    os.utime(cache._path(key), (time.time() - 10, time.time() - 10))
+    ResponseCache(ttl=5, cache_dir=str(tmp_path))
+    assert disk_entries(tmp_path) == []
+
+
+def test_disk_is_bounded(tmp_path):
+    # Acima de max_disk_entries, as gravações mais antigas são removidas, e as recentes continuam legíveis
+    cache = ResponseCache(max_entries=2, cache_dir=str(tmp_path), max_disk_entries=4, prune_every=1)
+    keys = [cache.make_key('prompt', version) for version in range(10)]
+    for age, key in enumerate(keys):
+        cache.put(key, key)
+        os.utime(cache._path(key), (time.time() - 100 + age, time.time() - 100 + age))
+    assert disk_entries(tmp_path) == sorted(f'{key}.json' for key in keys[-4:])
+    assert ResponseCache(cache_dir=str(tmp_path)).get(keys[-3]) == keys[-3]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import RollupPyramid
+from stats_index import as_datetime
+
+
+@pytest.fixture(scope='module')
+def bitrate(measurements):
+    # Medições de bitrate com timestamps convertidos e cliente/servidor como texto
+    bitrate_data = measurements[0]
+    return pd.DataFrame({
+        'client': bitrate_data['client'].astype(str),
+        'server': bitrate_data['server'].astype(str),
+        'timestamp': as_datetime(bitrate_data['timestamp']),
+        'bitrate': bitrate_data['bitrate'].astype(float),
+    })
+
+
+@pytest.fixture(scope='module')
+def pyramid(measurements):
+    # Pirâmide montada em dois lotes, como após uma inclusão incremental
+    bitrate_data = measurements[0]
+    half = len(bitrate_data) // 2
+    pyramid = RollupPyramid()
+    pyramid.add(bitrate_data.iloc[:half], 'bitrate')
+    pyramid.add(bitrate_data.iloc[half:], 'bitrate')
+    return pyramid
+
+
+def test_summarize_matches_brute_force(pyramid, bitrate):
+    # Intervalos arbitrários (alinhados ao minuto) dão as mesmas estatísticas que filtrar as medições
+    rng = np.random.default_rng(2)
+    first, last = bitrate['timestamp'].min().floor('1min'), bitrate['timestamp'].max().ceil('1min')
+    minutes = int((last - first) / pd.Timedelta(minutes=1))
+    for _ in range(25):
+        start, end = sorted(first + pd.Timedelta(minutes=int(m)) for m in rng.integers(0, minutes, 2))
+        for dimension, entity in (('client', 'ba'), ('server', 'pi')):
+            rows = bitrate[(bitrate[dimension] == entity) & (bitrate['timestamp'] >= start) & (bitrate['timestamp'] < end)]
+            summary = pyramid.summarize('bitrate', dimension, entity, start, end)
+            assert summary['count'] == len(rows)
+            if len(rows):
+                assert summary['sum'] == pytest.approx(rows['bitrate'].sum())
+                assert (summary['min'], summary['max']) == (rows['bitrate'].min(), rows['bitrate'].max())
+            if len(rows) > 1:
+                assert summary['std'] == pytest.approx(rows['bitrate'].std(), rel=1e-6)
+
+
+def test_summarize_whole_range(pyramid, bitrate):
+    # Sem limites, as células diárias cobrem todas as medições da entidade
+    rows = bitrate[bitrate['client'] == 'rj']
+    summary = pyramid.summarize('bitrate', 'client', 'rj')
+    assert summary['count'] == len(rows)
+    assert summary['mean'] == pytest.approx(rows['bitrate'].mean())
+    assert pyramid.summarize('bitrate', 'client', 'xx') is None
+
+
+def test_maintained_answers_match_brute_force(pyramid, bitrate):
+    # Maior amplitude em 5 minutos e médias por hora do dia, mantidas a cada inclusão
+    for client, rows in bitrate.groupby('client'):
+        windows = rows.groupby(rows['timestamp'].dt.floor('5min'))['bitrate']
+        assert pyramid.max_range('bitrate', 'client', client) == (windows.max() - windows.min()).max()
+    for server, rows in bitrate.groupby('server'):
+        expected = rows.groupby(rows['timestamp'].dt.hour)['bitrate'].mean()
+        means = pyramid.hourly_means('bitrate', 'server', server)
+        assert list(means) == list(expected.index)
+        assert list(means.values()) == pytest.approx(list(expected))
+    assert pyramid.max_range('bitrate', 'client', 'xx') is None
+
+
+def test_latest_per_metric_and_entity(measurements, bitrate):
+    # A medição mais recente é mantida por métrica e por entidade
+    latency_data = measurements[1]
+    pyramid = RollupPyramid()
+    pyramid.add(latency_data, 'rtt')
+    pyramid.add(measurements[0], 'bitrate')
+    assert pyramid.latest['rtt'] == as_datetime(latency_data['timestamp']).max()
+    assert pyramid.latest['bitrate'] == bitrate['timestamp'].max()
+    assert pyramid.entity_latest[('bitrate', 'client', 'ba')] == bitrate.loc[bitrate['client'] == 'ba', 'timestamp'].max()
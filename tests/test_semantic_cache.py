@@ -0,0 +1,45 @@
+import numpy as np
+
+from fake_openai import FakeOpenAI
+from semantic_cache import SemanticAnswerCache
+
+SCOPE = ('calculate_avg_latency_for_client', ('ba',), 'v1')
+
+
+def test_paraphrase_hits_within_scope():
+    # Uma paráfrase próxima reutiliza a resposta; outra entidade ou versão dos dados não
+    embed = FakeOpenAI(latency=0).embed
+    cache = SemanticAnswerCache(radius=0.8)
+    cache.put(embed("qual a latência média do cliente ba"), SCOPE, 'resposta')
+    assert cache.get(embed("qual é a latência média do cliente ba"), SCOPE) == 'resposta'
+    assert cache.get(embed("qual o bitrate do servidor pi hoje"), SCOPE) is None
+    assert cache.get(embed("qual a latência média do cliente ba"), SCOPE[:2] + ('v2',)) is None
+    assert cache.get(embed("qual a latência média do cliente ba"), (SCOPE[0], ('rj',), 'v1')) is None
+
+
+def test_evicts_least_recently_used():
+    # Acima de max_entries, a resposta substituída é a usada há mais tempo
+    cache = SemanticAnswerCache(max_entries=2, radius=0.99)
+    vectors = np.eye(3)
+    cache.put(vectors[0], SCOPE, 'a')
+    cache.put(vectors[1], SCOPE, 'b')
+    assert cache.get(vectors[0], SCOPE) == 'a'
+    cache.put(vectors[2], SCOPE, 'c')
+    assert [cache.get(vector, SCOPE) for vector in vectors] == ['a', None, 'c']
+
+
+def test_forgets_scopes_without_rows():
+    # Escopos de versões antigas dos dados somem quando sua última resposta é substituída
+    cache = SemanticAnswerCache(max_entries=4, radius=0.99)
+    rng = np.random.default_rng(3)
+    for version in range(50):
+        for _ in range(2):
+            cache.put(rng.normal(size=8), SCOPE[:2] + (version,), str(version))
+    assert sorted(cache.scope_ids) == [SCOPE[:2] + (48,), SCOPE[:2] + (49,)]
+    assert sum(cache.scope_rows.values()) == cache.size == 4
+
+    vector = rng.normal(size=8)
+    cache.put(vector, SCOPE, 'nova')
+    assert cache.get(vector, SCOPE) == 'nova'
+    cache.clear()
+    assert cache.get(vector, SCOPE) is None and cache.scope_ids == {}
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sharded_preprocess import aggregate_minute_means, aggregate_minute_means_sharded, balanced_cuts
+
+
+@pytest.mark.parametrize('shard_by, workers', [('client', 2), ('time', 3)])
+def test_sharded_matches_serial(measurements, shard_by, workers):
+    # Os shards agregados no pool de processos reproduzem exatamente o resultado serial, na mesma ordem
+    bitrate_data, latency_data = measurements
+    serial = aggregate_minute_means(bitrate_data, latency_data)
+    sharded = aggregate_minute_means_sharded(bitrate_data, latency_data, workers=workers, shard_by=shard_by)
+    pd.testing.assert_frame_equal(sharded, serial)
+
+
+def test_balanced_cuts():
+    # Faixas contíguas de peso parecido, sem faixas vazias
+    assert balanced_cuts(np.array([1, 1, 1, 1]), 2) == [0, 2, 4]
+    assert balanced_cuts(np.array([1, 3, 1, 1, 2]), 2) == [0, 2, 5]
+    assert balanced_cuts(np.array([5]), 4) == [0, 1]
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats_index import StatsIndex, merge_summaries, summarize
+
+
+def test_merge_summaries_matches_single_pass():
+    # A combinação de Chan de dois resumos parciais é igual ao resumo de todos os valores de uma vez
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.normal(1000.0, 250.0, 500))
+    keys = pd.Series(rng.choice(['a', 'b', 'c'], 500))
+    keys[:40] = 'a'
+    left = summarize(values[:200], keys[:200])
+    right = summarize(values[200:], keys[200:])
+    pd.testing.assert_frame_equal(merge_summaries(left, right), summarize(values, keys), check_freq=False)
+
+
+def test_merge_summaries_with_disjoint_entities():
+    # Entidades presentes em só um dos lados mantêm suas estatísticas
+    left = summarize(pd.Series([1.0, 2.0, 4.0]), pd.Series(['a', 'a', 'a']))
+    right = summarize(pd.Series([10.0]), pd.Series(['b']))
+    merged = merge_summaries(left, right)
+    assert merged.loc['a', 'count'] == 3 and merged.loc['a', 'm2'] == pytest.approx(14 / 3)
+    assert merged.loc['b', 'count'] == 1 and merged.loc['b', 'm2'] == 0.0
+
+
+def test_index_in_batches_matches_pandas(measurements):
+    # O índice construído em lotes responde como o groupby sobre todas as medições
+    bitrate_data, latency_data = measurements
+    index = StatsIndex()
+    for start in range(0, len(bitrate_data), 50_000):
+        index.add_bitrate(bitrate_data.iloc[start:start + 50_000])
+    index.add_latency(latency_data)
+
+    for source, data in (('bitrate', bitrate_data), ('rtt', latency_data)):
+        for dimension in ('client', 'server'):
+            expected = data[source].astype(float).groupby(data[dimension].astype(str)).agg(['count', 'mean', 'var', 'min', 'max'])
+            for entity, row in expected.iterrows():
+                stats = index.get(source, dimension, entity)
+                assert stats['count'] == row['count']
+                assert stats['mean'] == pytest.approx(row['mean'], rel=1e-9)
+                assert stats['var'] == pytest.approx(row['var'], rel=1e-9)
+                assert (stats['min'], stats['max']) == (row['min'], row['max'])
+
+
+def test_resolve_ignores_case(measurements):
+    # Nomes de entidades são resolvidos sem diferenciar maiúsculas
+    index = StatsIndex()
+    index.add_latency(measurements[1])
+    assert index.resolve('rtt', 'client', 'BA') == 'ba'
+    assert index.resolve('rtt', 'client', 'xx') is None
@@ -0,0 +1,66 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from switch_planner import build_qoe_cube, plan_fleet, plan_switches
+
+
+def brute_force(qoe, switch_penalty):
+    # Melhor valor de um cliente testando todas as sequências de servidores: soma da QoE menos a penalidade
+    # por troca; minutos sem medição não rendem nada e servidores sem medição não podem ser escolhidos
+    n_minutes, n_servers = qoe.shape
+    has_data = np.isfinite(qoe).any(axis=1)
+    best = -np.inf
+    for path in itertools.product(range(n_servers), repeat=n_minutes):
+        rewards = [qoe[t, s] if has_data[t] else 0.0 for t, s in enumerate(path)]
+        if any(np.isnan(rewards)):
+            continue
+        switches = sum(a != b for a, b in zip(path, path[1:]))
+        best = max(best, sum(rewards) - switch_penalty * switches)
+    return best
+
+
+def path_value(qoe, path, switch_penalty):
+    # Valor de um caminho sem minutos vazios
+    switches = np.count_nonzero(path[1:] != path[:-1])
+    return qoe[np.arange(len(path)), path].sum() - switch_penalty * switches
+
+
+@pytest.mark.parametrize('switch_penalty', [0.0, 0.3, 2.0])
+def test_plan_matches_brute_force(switch_penalty):
+    # Em cubos pequenos com servidores ausentes e minutos vazios, o Viterbi alcança o ótimo da força bruta
+    rng = np.random.default_rng(1)
+    cube = rng.uniform(0.0, 3.0, (12, 6, 3))
+    cube[rng.uniform(size=cube.shape) < 0.3] = np.nan
+    cube[rng.uniform(size=cube.shape[:2]) < 0.1] = np.nan
+    path, score = plan_switches(cube, switch_penalty)
+
+    for client in range(cube.shape[0]):
+        assert score[client] == pytest.approx(brute_force(cube[client], switch_penalty))
+        if (path[client] >= 0).all():
+            assert path_value(cube[client], path[client], switch_penalty) == pytest.approx(score[client])
+        assert (path[client] < 0).tolist() == (~np.isfinite(cube[client]).any(axis=1)).tolist()
+
+
+def test_plan_fleet_counts_switches():
+    # O plano escolhe o melhor servidor a cada minuto sem penalidade e conta as trocas entre minutos consecutivos
+    minutes = pd.to_datetime([0, 60, 120], unit='s')
+    data = pd.DataFrame({
+        'client': ['ba'] * 6,
+        'server': ['ce', 'df'] * 3,
+        'minute': minutes.repeat(2),
+        'QoE': [1.0, 2.0, 3.0, 1.0, 1.0, 4.0],
+    })
+    clients, _, servers, cube = build_qoe_cube(data)
+    assert list(clients) == ['ba'] and list(servers) == ['ce', 'df'] and cube.shape == (1, 3, 2)
+
+    plan, summary = plan_fleet(data)
+    assert plan['server'].tolist() == ['df', 'ce', 'df']
+    assert summary.loc['ba', 'switches'] == 2
+    assert summary.loc['ba', 'plan_qoe'] == pytest.approx(3.0)
+    assert summary.loc['ba', 'expected_gain'] == pytest.approx(3.0 - 2.0)
+
+    plan, summary = plan_fleet(data, switch_penalty=5.0)
+    assert plan['server'].nunique() == 1 and summary.loc['ba', 'switches'] == 0
@@ -0,0 +1,25 @@
+import gc
+import os
+
+from main import Main
+
+# Instância criada no processo mestre; os workers a herdam pelo fork
+main_instance = None
+
+
+def create_app(api_key=None, **options):
+    # Fábrica WSGI para servidores com pré-fork (ex.: gunicorn --preload): carrega os dados, os agregados
+    # e a matriz de embeddings de referência uma única vez, no processo mestre
+    global main_instance
+    main_instance = Main(api_key or os.environ.get('OPENAI_API_KEY'), shared_jobs=True, **options)
+
+    # Congela os objetos criados na inicialização: a coleta de lixo dos workers deixa de percorrê-los,
+    # preservando as páginas de memória compartilhadas por copy-on-write
+    gc.freeze()
+    return main_instance.app.server
+
+
+def post_fork(server, worker):
+    # Gancho do gunicorn executado em cada worker logo após o fork
+    if main_instance is not None:
+        main_instance.after_fork()